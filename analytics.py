@@ -0,0 +1,103 @@
+"""Time-bucketed chat analytics: rollup aggregation and histogram percentiles."""
+
+from bisect import bisect_left
+from datetime import timedelta
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open ended
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000)
+
+PERIODS = ('hour', 'day')
+
+# Tenant id used in rollups for the public demo chat (conversations without a user)
+DEMO_TENANT = 0
+
+
+def latency_bucket(latency_ms):
+    """Index of the histogram bucket a latency falls into"""
+    return bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+
+
+def bucket_start(moment, period):
+    if period == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def histogram_percentile(counts, q):
+    """Approximate the q-th percentile (0-100) from {bucket index: count}.
+
+    Interpolates linearly inside the bucket holding the percentile, so the
+    error is bounded by that bucket's width.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = total * q / 100
+    seen = 0
+    for index in sorted(counts):
+        count = counts[index]
+        if seen + count >= rank:
+            lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0
+            if index >= len(LATENCY_BUCKETS_MS):
+                return lower
+            return round(lower + (LATENCY_BUCKETS_MS[index] - lower) * (rank - seen) / count)
+        seen += count
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def rollup_turns(turns):
+    """Aggregate chat turns into rollup increments.
+
+    Each turn is a dict with tenant_id, created_at, latency_ms, cache_hit,
+    fallback, tokens and keywords. Returns (counter rows, latency histogram
+    rows, keyword rows), each a list of dicts keyed like the rollup tables,
+    for both hourly and daily buckets (keywords are daily only).
+    """
+    counters = {}
+    latencies = {}
+    keywords = {}
+    for turn in turns:
+        tenant_id = turn["tenant_id"]
+        latency_index = latency_bucket(turn["latency_ms"])
+        for period in PERIODS:
+            start = bucket_start(turn["created_at"], period)
+            row = counters.get((tenant_id, period, start))
+            if row is None:
+                row = counters[(tenant_id, period, start)] = {
+                    "tenant_id": tenant_id, "period": period, "bucket_start": start,
+                    "message_count": 0, "cache_hits": 0, "fallbacks": 0, "tokens": 0, "latency_total_ms": 0,
+                }
+            row["message_count"] += 1
+            row["cache_hits"] += int(bool(turn["cache_hit"]))
+            row["fallbacks"] += int(bool(turn["fallback"]))
+            row["tokens"] += turn["tokens"] or 0
+            row["latency_total_ms"] += turn["latency_ms"]
+
+            key = (tenant_id, period, start, latency_index)
+            latencies[key] = latencies.get(key, 0) + 1
+
+        day = bucket_start(turn["created_at"], 'day')
+        for keyword in turn.get("keywords") or ():
+            key = (tenant_id, day, keyword)
+            keywords[key] = keywords.get(key, 0) + 1
+
+    latency_rows = [
+        {"tenant_id": tenant_id, "period": period, "bucket_start": start, "latency_bucket": index, "count": count}
+        for (tenant_id, period, start, index), count in latencies.items()
+    ]
+    keyword_rows = [
+        {"tenant_id": tenant_id, "bucket_start": day, "keyword": keyword, "hits": hits}
+        for (tenant_id, day, keyword), hits in keywords.items()
+    ]
+    return list(counters.values()), latency_rows, keyword_rows
+
+
+def bucket_series(start, end, period):
+    """Every bucket start from start up to (not including) end"""
+    step = timedelta(hours=1) if period == 'hour' else timedelta(days=1)
+    current = bucket_start(start, period)
+    series = []
+    while current < end:
+        series.append(current)
+        current += step
+    return series
@@ -0,0 +1,152 @@
+"""Local stand-in for the OpenAI chat completions API used by the benchmarks.
+
+Answers POST /v1/chat/completions after a configurable delay, either as one
+JSON body or as a server-sent event stream with a delay between chunks, and
+reports token usage like the real API. Run standalone with
+
+    python -m benchmarks.fake_openai --port 8900 --latency-ms 400 --stream-chunks 20
+
+and point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_WORDS = (
+    "Merhaba! Kamp alanımız hafta sonu ve hafta içi açıktır, fiyatlara aktiviteler dahildir "
+    "ve rezervasyon için yüzde otuz ön ödeme yeterlidir. Başka bir sorunuz olursa yazabilirsiniz."
+).split()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 adds SYN-retry stalls under concurrency
+
+    def __init__(self, address, latency_ms=300, jitter_ms=50, stream_chunks=16, chunk_delay_ms=20, error_rate=0.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stream_chunks = stream_chunks
+        self.chunk_delay_ms = chunk_delay_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors}
+
+    def count(self, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the httpx pool in openai_service
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        server = self.server
+        request = json.loads(body or b"{}")
+        time.sleep(max(0, server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms)) / 1000)
+        if random.random() < server.error_rate:
+            server.count(error=True)
+            self._send_json(500, {"error": {"message": "fake upstream error", "type": "server_error"}})
+            return
+        server.count()
+
+        prompt_tokens = sum(len(message.get("content") or "") for message in request.get("messages", [])) // 3
+        words = REPLY_WORDS[:max(1, min(len(REPLY_WORDS), request.get("max_tokens") or len(REPLY_WORDS)))]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        if request.get("stream"):
+            self._send_stream(request, words, usage)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model", "gpt-5"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": usage,
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, request, words, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk_count = max(1, min(self.server.stream_chunks, len(words)))
+        step = -(-len(words) // chunk_count)
+        base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "gpt-5")}
+        for start in range(0, len(words), step):
+            text = " ".join(words[start:start + step]) + (" " if start + step < len(words) else "")
+            self._write_event(dict(base, choices=[{"index": 0, "delta": {"content": text}, "finish_reason": None}]))
+            time.sleep(self.server.chunk_delay_ms / 1000)
+        self._write_event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event(dict(base, choices=[], usage=usage))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def start_fake_openai(host="127.0.0.1", port=0, **options):
+    """Start the server on a background thread and return it (port 0 picks a free port)"""
+    server = FakeOpenAIServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300, help="delay before the first byte")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--stream-chunks", type=int, default=16)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    args = parser.parse_args()
+    server = FakeOpenAIServer((args.host, args.port), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              stream_chunks=args.stream_chunks, chunk_delay_ms=args.chunk_delay_ms,
+                              error_rate=args.error_rate)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""Throughput and latency benchmarks for the chat, dashboard and bot settings routes.
+
+Seeds a throwaway database with one tenant per size in --sizes (that many
+SavedBotText rows each, indexed like real uploads), points the app at a local
+fake OpenAI server and replays a chat workload with --concurrency client
+threads. Each scenario reports requests/s, p50/p95/p99 latency and peak RSS;
+results are written as JSON and can be compared against an earlier run:
+
+    python -m benchmarks.run --sizes 10,1000 --requests 300 --concurrency 8
+    python -m benchmarks.run --mode gunicorn --stream --baseline benchmarks/results/previous.json
+
+In-process mode drives the Flask test client inside this process; gunicorn
+mode starts the deployment's gunicorn command and drives it over HTTP.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from benchmarks.fake_openai import start_fake_openai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("chat", "bot_chat", "dashboard", "bot_settings")
+BENCH_PASSWORD = "bench-password"
+
+TOPICS = ("kamp", "çadır", "kano", "rezervasyon", "ödeme", "ulaşım", "otobüs", "kahvaltı", "akşam yemeği",
+          "evcil hayvan", "çocuk", "trekking", "ateş başı", "hafta sonu", "hafta içi", "iptal", "grup",
+          "doğum günü", "şirket etkinliği", "otopark", "duş", "elektrik", "wifi", "uyku tulumu", "matras")
+FILLER = ("misafirlerimiz", "için", "her", "gün", "saat", "alanında", "ücretsiz", "olarak", "sunulur",
+          "detaylar", "resepsiyonda", "bulunabilir", "ekibimiz", "yardımcı", "olur", "ve", "ile", "bilgi")
+HOT_QUESTIONS = (
+    "Fiyatlarınız ne kadar?", "Hafta sonu kamp ücreti nedir?", "Rezervasyon nasıl yapılır?",
+    "Köpeğimi getirebilir miyim?", "Hangi aktiviteler var?", "Çadır kiralayabilir miyim?",
+    "Ulaşım nasıl sağlanıyor?", "Check-in saati kaçta?", "Kahvaltı dahil mi?", "Merhaba",
+)
+QUESTION_TEMPLATES = ("{topic} hakkında bilgi alabilir miyim?", "{topic} için ücret ne kadar?",
+                      "{topic} var mı, nasıl ayarlanıyor?", "{topic} ile ilgili kurallarınız neler?")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=("inprocess", "gunicorn"), default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated, from " + ", ".join(SCENARIOS))
+    parser.add_argument("--sizes", default="10,1000,100000", help="SavedBotText rows per seeded tenant")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="request SSE streaming from the chat endpoints")
+    parser.add_argument("--hot-ratio", type=float, default=0.3,
+                        help="fraction of chat messages drawn from a small set of repeated questions")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-stream-chunks", type=int, default=16)
+    parser.add_argument("--llm-chunk-delay-ms", type=float, default=20)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (gunicorn mode)")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker (gunicorn mode)")
+    parser.add_argument("--db", help="SQLite file to seed/reuse (default: a fresh temporary file)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app, e.g. LLM_MAX_IN_FLIGHT_PER_TENANT=16")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--baseline", help="earlier result JSON to compare against")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PERCENT",
+                        help="exit 1 if any scenario's p95 is this much slower, or RPS this much lower, than the baseline")
+    return parser.parse_args()
+
+
+# ---------------- ENVIRONMENT ---------------- #
+def app_environment(args, db_path, llm_base_url):
+    """Environment for the app under test: bench database, fake upstream, limits out of the way"""
+    env = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "FLASK_SECRET_KEY": "bench-secret",
+        "OPENAI_API_KEY": "bench-key",
+        "OPENAI_BASE_URL": llm_base_url,
+        "LLM_MAX_RETRIES": "0",
+        "DEMO_RATE_PER_MINUTE": "1000000000",
+        "DEMO_RATE_BURST": "1000000000",
+        "USER_RATE_PER_MINUTE": "1000000000",
+        "USER_RATE_BURST": "1000000000",
+        "USER_DAILY_REQUESTS": "1000000000",
+        "USER_DAILY_TOKENS": "1000000000000",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ---------------- SEEDING ---------------- #
+def bench_email(size):
+    return f"bench-{size}@bench.local"
+
+
+def make_text(rng, words):
+    topics = rng.sample(TOPICS, 3)
+    body = [rng.choice(FILLER if rng.random() < 0.7 else topics) for _ in range(words)]
+    return " ".join(body).capitalize() + ".", topics
+
+
+def seed_tenant(main, size, rng, batch_size=5000):
+    """Create the tenant for ``size`` with that many saved texts and index them; return its user id"""
+    db = main.db
+    user = main.User.query.filter_by(email=bench_email(size)).first()
+    if user is not None:
+        return user.id
+
+    user = main.User()
+    user.full_name = f"Bench {size}"
+    user.email = bench_email(size)
+    user.password = main.generate_password_hash(BENCH_PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+    settings = main.BotSettings()
+    settings.user_id = user.id
+    settings.bot_purpose = "Kamp alanımız hakkında misafir sorularını yanıtlayan bir asistan."
+    settings.bot_title = "SahilKamp"
+    settings.bot_info_text = make_text(rng, 120)[0]
+    db.session.add(settings)
+    db.session.commit()
+
+    now = datetime.now()
+    table = main.SavedBotText.__table__
+    for start in range(0, size, batch_size):
+        rows = []
+        for position in range(start, min(size, start + batch_size)):
+            content, topics = make_text(rng, rng.randint(40, 160))
+            rows.append({"user_id": user.id, "title": f"Metin {position + 1}", "content": content,
+                         "keywords": ", ".join(topics), "created_at": now - timedelta(minutes=position)})
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+    main.rebuild_knowledge_index(user.id)
+    return user.id
+
+
+def seed(args, sizes):
+    """Seed every tenant through the app's own models and indexing (imports main in this process)"""
+    import main
+    rng = random.Random(args.seed)
+    with main.app.app_context():
+        main.upgrade_database()
+        for size in sizes:
+            started = time.perf_counter()
+            seed_tenant(main, size, rng)
+            print(f"seeded tenant with {size} texts in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return main
+
+
+# ---------------- CLIENTS ---------------- #
+class InProcessClient:
+    """Flask test client, one per load thread"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, data=None):
+        response = self.client.open(path, method=method, json=json, data=data)
+        body = response.get_data()
+        response.close()
+        return response.status_code, body
+
+
+class HTTPClient:
+    """requests session against a running server, one per load thread"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def request(self, method, path, json=None, data=None):
+        response = self.session.request(method, self.base_url + path, json=json, data=data, allow_redirects=False)
+        return response.status_code, response.content
+
+
+def login(client, email):
+    status, body = client.request("GET", "/login")
+    token = re.search(rb'name="csrf_token" value="([^"]+)"', body)
+    status, _ = client.request("POST", "/login", data={
+        "email": email, "password": BENCH_PASSWORD, "csrf_token": token.group(1).decode() if token else "",
+    })
+    if status != 302:
+        raise RuntimeError(f"login as {email} failed with HTTP {status}")
+
+
+# ---------------- WORKLOAD ---------------- #
+def chat_message(rng, hot_ratio):
+    if rng.random() < hot_ratio:
+        return rng.choice(HOT_QUESTIONS)
+    question = rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(TOPICS))
+    return f"{question} ({rng.randrange(10 ** 6)})"
+
+
+def scenario_request(scenario, rng, args):
+    """(method, path, json body) of one request of a scenario"""
+    if scenario == "chat":
+        return "POST", "/api/chat", {"message": chat_message(rng, args.hot_ratio), "stream": args.stream}
+    if scenario == "bot_chat":
+        return "POST", "/api/bot-chat", {"message": chat_message(rng, args.hot_ratio), "stream": args.stream}
+    if scenario == "dashboard":
+        return "GET", "/dashboard", None
+    return "GET", "/bot-settings", None
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index] * 1000, 2)
+
+
+def run_load(make_client, scenario, email, args, rss_probe):
+    """Replay one scenario with --concurrency threads; return its result row"""
+    counter = itertools.count()
+    total = args.warmup + args.requests
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    measure_start = [None]
+
+    def worker(worker_id):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        client = make_client()
+        if email:
+            login(client, email)
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            method, path, body = scenario_request(scenario, rng, args)
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, json=body)
+            except Exception as error:
+                status = type(error).__name__
+            elapsed = time.perf_counter() - started
+            if index < args.warmup:
+                continue
+            with lock:
+                if measure_start[0] is None:
+                    measure_start[0] = started
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    rss_probe.reset()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    finished = time.perf_counter()
+
+    latencies.sort()
+    duration = finished - measure_start[0] if measure_start[0] else 0
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 2) if duration else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "peak_rss_mb": rss_probe.peak_mb(),
+    }
+
+
+# ---------------- MEMORY ---------------- #
+def read_status_kb(pid, field):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class SelfRSSProbe:
+    """Peak RSS of this process; the Linux high-water mark is reset per scenario where allowed"""
+
+    def reset(self):
+        try:
+            with open("/proc/self/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+        except OSError:
+            pass
+
+    def peak_mb(self):
+        peak_kb = read_status_kb("self", "VmHWM")
+        if peak_kb is None:
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == "darwin":
+                peak_kb //= 1024
+        return round(peak_kb / 1024, 1)
+
+
+class ProcessTreeRSSProbe:
+    """Peak summed RSS of a server process and its children, sampled every ``interval`` seconds"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    def _tree(self):
+        pids = [self.pid]
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+            except OSError:
+                pass
+        return pids
+
+    def _sample(self):
+        while True:
+            total = sum(read_status_kb(pid, "VmRSS") or 0 for pid in self._tree())
+            self.peak_kb = max(self.peak_kb, total)
+            time.sleep(self.interval)
+
+    def reset(self):
+        self.peak_kb = 0
+
+    def peak_mb(self):
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+
+# ---------------- SERVER ---------------- #
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, env):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", f"--bind=127.0.0.1:{port}", "--worker-class=gthread",
+         f"--threads={args.threads}", f"--workers={args.workers}", "--log-level=warning", "main:app"],
+        cwd=ROOT, env=dict(os.environ, **env),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    client = HTTPClient(base_url)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if client.request("GET", "/health")[0] == 200:
+                return process, base_url
+        except Exception:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become healthy within 60s")
+
+
+# ---------------- REPORT ---------------- #
+def result_key(row):
+    return row["scenario"], row["rows"]
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a baseline run; return True if a regression exceeds threshold"""
+    previous = {result_key(row): row for row in baseline["results"]}
+    regressed = False
+    print(f"\nvs baseline {baseline['meta'].get('git_revision')} ({baseline['meta'].get('started_at')}):")
+    for row in results:
+        old = previous.get(result_key(row))
+        if not old or not old.get("rps") or not row.get("rps") or not old.get("p95_ms") or not row.get("p95_ms"):
+            continue
+        rps_change = 100 * (row["rps"] - old["rps"]) / old["rps"]
+        p95_change = 100 * (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"]
+        flag = ""
+        if threshold is not None and (p95_change > threshold or rps_change < -threshold):
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"  {row['scenario']:<13} rows={str(row['rows']):<7} rps {rps_change:+6.1f}%  p95 {p95_change:+6.1f}%{flag}")
+    return regressed
+
+
+def main():
+    args = parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    llm = start_fake_openai(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                            stream_chunks=args.llm_stream_chunks, chunk_delay_ms=args.llm_chunk_delay_ms,
+                            error_rate=args.llm_error_rate)
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(prefix="botcuk-bench-"), "bench.db")
+    env = app_environment(args, db_path, llm.base_url)
+    os.environ.update(env)  # read by main/openai_service at import
+    sys.path.insert(0, ROOT)
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    app_module = seed(args, sizes)
+    server = None
+    if args.mode == "gunicorn":
+        server, base_url = start_gunicorn(args, env)
+        make_client = lambda: HTTPClient(base_url)
+        rss_probe = ProcessTreeRSSProbe(server.pid)
+    else:
+        make_client = lambda: InProcessClient(app_module.app)
+        rss_probe = SelfRSSProbe()
+
+    results = []
+    try:
+        for scenario in scenarios:
+            # The demo chat does not depend on tenant data, run it once
+            for size in ([None] if scenario == "chat" else sizes):
+                upstream_before = llm.stats()["requests"]
+                row = run_load(make_client, scenario, bench_email(size) if size is not None else None, args, rss_probe)
+                row = dict(scenario=scenario, rows=size, upstream_calls=llm.stats()["requests"] - upstream_before, **row)
+                results.append(row)
+                print(f"{scenario:<13} rows={str(size):<7} rps={row['rps']}  p50={row['p50_ms']}ms  "
+                      f"p95={row['p95_ms']}ms  p99={row['p99_ms']}ms  errors={row['errors']}  "
+                      f"peak_rss={row['peak_rss_mb']}MB", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "started_at": started_at,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "mode": args.mode,
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2, ensure_ascii=False)
+    print(f"results written to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            if compare(results, json.load(handle), args.fail_on_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Cold start benchmark: import time and first requests in fresh interpreters.
+
+Each target runs --repeat times in a new Python process that imports the
+entry module, serves the first requests for the public pages and reports
+which heavy modules ended up loaded. The serverless entry (wsgi) is checked
+against the import-time budgets; main.py is measured for comparison:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 9 --budget-import-ms 300 --output startup.json
+
+Exits 1 if a budget is exceeded or a heavy module is loaded by the light path.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ("/health", "/pricing", "/")
+HEAVY_MODULES = ("sqlalchemy", "flask_sqlalchemy", "flask_wtf", "alembic", "openai", "httpx", "numpy", "requests")
+
+# Runs in the fresh interpreter; prints one JSON line
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+from werkzeug.test import Client
+client = Client(module.app)
+requests = {}
+for path in sys.argv[2].split(","):
+    request_started = time.perf_counter()
+    response = client.get(path)
+    response.close()
+    requests[path] = {"status": response.status_code, "ms": (time.perf_counter() - request_started) * 1000}
+links_ok = None
+if sys.argv[1] == "main":
+    import factory
+    from flask import url_for
+    with module.app.test_request_context():
+        links_ok = all(url_for(endpoint) == path for endpoint, path in factory.FULL_APP_LINKS.items())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "requests": requests,
+    "loaded": [name for name in sys.argv[3].split(",") if name in sys.modules],
+    "links_ok": links_ok,
+}))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per target (the median is reported)")
+    parser.add_argument("--budget-import-ms", type=float, default=400, help="max median import time of wsgi")
+    parser.add_argument("--budget-first-request-ms", type=float, default=150,
+                        help="max median time of the first request to each public page through wsgi")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/startup-<time>.json)")
+    return parser.parse_args()
+
+
+def targets(workdir):
+    """(name, module, extra environment, budgeted) for every measured configuration"""
+    template_cache = os.path.join(workdir, "templates")
+    return (
+        ("wsgi", "wsgi", {}, True),
+        ("wsgi+template-cache", "wsgi", {"TEMPLATE_CACHE_DIR": template_cache}, True),
+        ("main", "main", {}, False),
+        ("main+openai-key", "main", {"OPENAI_API_KEY": "startup-bench-key"}, False),
+    )
+
+
+def probe(module, env):
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, module, ",".join(PAGES), ",".join(HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if completed.returncode != 0:
+        sys.exit(f"probe of {module} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def fill_template_cache(env):
+    """Compile every template into TEMPLATE_CACHE_DIR like the build step does"""
+    code = "import factory; factory.compile_templates(factory.create_app(full=False))"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def measure(name, module, env, repeat):
+    runs = [probe(module, env) for _ in range(repeat)]
+    return {
+        "target": name,
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "first_request_ms": {path: round(statistics.median(run["requests"][path]["ms"] for run in runs), 1)
+                             for path in PAGES},
+        "statuses": {path: runs[0]["requests"][path]["status"] for path in PAGES},
+        "loaded": runs[0]["loaded"],
+        "links_ok": runs[0]["links_ok"],
+    }
+
+
+def check(row, args):
+    """Budget violations of a budgeted target, as messages"""
+    problems = []
+    if row["import_ms"] > args.budget_import_ms:
+        problems.append(f"import {row['import_ms']}ms > {args.budget_import_ms}ms")
+    for path, ms in row["first_request_ms"].items():
+        if ms > args.budget_first_request_ms:
+            problems.append(f"first {path} {ms}ms > {args.budget_first_request_ms}ms")
+    if row["loaded"]:
+        problems.append(f"heavy modules loaded: {', '.join(row['loaded'])}")
+    return problems
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="botcuk-startup-")
+    base_env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+                    FLASK_SECRET_KEY="startup-bench-secret")
+    base_env.pop("OPENAI_API_KEY", None)
+    base_env.pop("TEMPLATE_CACHE_DIR", None)
+
+    results, failures = [], []
+    for name, module, extra, budgeted in targets(workdir):
+        env = dict(base_env, **extra)
+        if "TEMPLATE_CACHE_DIR" in extra:
+            fill_template_cache(env)
+        row = measure(name, module, env, args.repeat)
+        row["problems"] = check(row, args) if budgeted else []
+        bad_status = [path for path, status in row["statuses"].items() if status != 200]
+        if bad_status:
+            row["problems"].append(f"non-200 responses: {', '.join(bad_status)}")
+        if row["links_ok"] is False:
+            row["problems"].append("factory.FULL_APP_LINKS does not match the routes of main.py")
+        results.append(row)
+        failures.extend(f"{name}: {problem}" for problem in row["problems"])
+        pages = "  ".join(f"{path}={ms}ms" for path, ms in row["first_request_ms"].items())
+        print(f"{name:<20} import={row['import_ms']}ms  {pages}  loaded={','.join(row['loaded']) or '-'}",
+              file=sys.stderr)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2, ensure_ascii=False)
+    print(f"results written to {output}", file=sys.stderr)
+
+    if failures:
+        print("\n".join(["budget exceeded:"] + [f"  {failure}" for failure in failures]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
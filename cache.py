@@ -0,0 +1,175 @@
+"""Small in-process caches shared by the Flask app and the OpenAI service."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache.
+
+    Bounded by entry count and, when ``max_bytes`` is set, by the total of
+    ``sizeof(value)``. Entries older than ``ttl`` seconds are treated as missing.
+    """
+
+    def __init__(self, max_items=256, ttl=None, max_bytes=None, sizeof=len):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._items = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            if item[1] is not None and item[1] < time.monotonic():
+                self._remove(key)
+                return default
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._items) > self.max_items or (self.max_bytes and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._items)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        value, _, size = self._items.pop(key)
+        self.bytes -= size
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteCache:
+    """String cache in a local SQLite file, shared by all workers on a host"""
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connection().execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else default
+
+    def set(self, key, value):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + self.ttl))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("DELETE FROM locks WHERE expires_at <= ?", (time.time(),))
+
+    def try_lock(self, key, timeout):
+        """Take a cross-worker lock on key; stale locks expire after timeout seconds"""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO locks (key, expires_at) VALUES (?, ?)", (key, now + timeout))
+        return cursor.rowcount == 1
+
+    def is_locked(self, key):
+        row = self._connection().execute("SELECT 1 FROM locks WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row is not None
+
+    def unlock(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM locks WHERE key = ?", (key,))
+
+    def wait_for(self, key, timeout, interval=0.05):
+        """Poll for a value another worker is computing under the lock on key"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = self.get(key)
+            if value is not None or not self.is_locked(key):
+                return value
+            time.sleep(interval)
+        return None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait and receive the same result (or exception). ``do`` returns
+    ``(result, shared)`` where ``shared`` is True for the waiting callers.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+            else:
+                self.coalesced += 1
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn()
+            return call["result"], False
+        except BaseException as error:
+            call["error"] = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def in_flight(self):
+        return len(self._calls)
@@ -0,0 +1,113 @@
+"""Application factory: Flask setup and the public pages that need no database.
+
+main.py builds the full app on top of ``create_app()``. wsgi.py serves the
+public pages from a bare ``create_app()`` and loads main.py only for the
+first request that needs it, so serverless cold starts of these pages skip
+SQLAlchemy, the OpenAI SDK and the models.
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from flask import Flask, render_template, jsonify, session
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+# .env yükle
+load_dotenv()
+
+# Endpoints linked from the public pages but served by main.py (url_for needs them without main loaded)
+FULL_APP_LINKS = {
+    'login': '/login',
+    'register': '/register',
+}
+
+# Optional directory for compiled template bytecode; fill it at build time with `flask --app main compile-templates`
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache that keeps working on a read-only filesystem (serverless bundles).
+
+    Entries are keyed by template name and source checksum, and Jinja ignores
+    entries written by another Python version, so a stale cache only costs a
+    recompile.
+    """
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def get_secret_key():
+    # Production-ready secret key configuration
+    secret_key = os.getenv("FLASK_SECRET_KEY")
+    if not secret_key:
+        if os.getenv("FLASK_ENV") == "production":
+            print("ERROR: FLASK_SECRET_KEY environment variable is required for production")
+            sys.exit(1)
+        else:
+            # Only use fallback for development
+            secret_key = "dev-secret-key-change-in-production"
+            print("WARNING: Using development secret key. Set FLASK_SECRET_KEY for production.")
+    return secret_key
+
+
+def create_app(full=True):
+    """Create the Flask app with the public pages registered.
+
+    ``full=False`` is for serving the public pages alone: links to the
+    endpoints in FULL_APP_LINKS are built from that table instead of failing.
+    """
+    app = Flask(__name__)
+    app.secret_key = get_secret_key()
+
+    # Behind a reverse proxy (e.g. Replit deployments) the client IP comes from X-Forwarded-For
+    trusted_proxy_count = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+    if trusted_proxy_count:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_count, x_proto=trusted_proxy_count)
+
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = TemplateBytecodeCache(TEMPLATE_CACHE_DIR)
+
+    if not full:
+        def build_full_app_link(error, endpoint, values):
+            # url_for passes its own options (_anchor, _external, ...) along with the URL values
+            plain_values = [name for name in values if not name.startswith('_')]
+            if endpoint in FULL_APP_LINKS and not plain_values and not values.get('_external'):
+                anchor = values.get('_anchor')
+                return FULL_APP_LINKS[endpoint] + (f"#{anchor}" if anchor else '')
+            raise error
+        app.url_build_error_handlers.append(build_full_app_link)
+
+    register_pages(app)
+    return app
+
+
+def register_pages(app):
+    @app.route("/")
+    def index():
+        user = session.get("user")
+        return render_template("index.html", user=user)
+
+    @app.route("/pricing")
+    def pricing():
+        return render_template("pricing.html")
+
+    # ---------------- HEALTH CHECK ---------------- #
+    @app.route("/health")
+    def health():
+        """Health check endpoint for deployment monitoring"""
+        return jsonify({"status": "ok", "service": "botcuk-platform"}), 200
+
+
+def compile_templates(app):
+    """Compile every template once so the bytecode cache is filled; return the template names"""
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
@@ -0,0 +1,435 @@
+"""Knowledge-base helpers for saved bot texts.
+
+Nothing here touches the database; the SQLAlchemy models that persist this
+data live in ``main.py``.
+"""
+
+import codecs
+import csv
+import hashlib
+import io
+import json
+import math
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from matcher import KeywordMatcher, fold_case, fold_for_matching
+
+# Passage sizing for chunked uploads and retrieval
+PASSAGE_CHARS = 600
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+READ_CHUNK_BYTES = 64 * 1024
+
+# Prompt budgeting (see pack_context)
+CHARS_PER_TOKEN = 3
+MIN_SNIPPET_TOKENS = 40
+
+# Hashed embedding settings (word unigrams plus character n-grams)
+EMBEDDING_DIM = 512
+CHAR_NGRAM = 3
+CHAR_NGRAM_WEIGHT = 0.5
+# Upper bound on the (queries x passages) similarity block scored at once by VectorIndex.search_many
+SEARCH_BLOCK_CELLS = 4 * 1024 * 1024
+
+
+def tokenize(text):
+    """Split text into case-folded word tokens"""
+    return TOKEN_RE.findall(fold_for_matching(text))
+
+
+@lru_cache(maxsize=200000)
+def term_hash(token):
+    """Stable 64-bit id of a token, used as the term key of stored BM25 statistics"""
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def term_stats(text):
+    """BM25 statistics of a passage, stored with it: (term hashes, term frequencies) as bytes"""
+    counts = Counter(tokenize(text))
+    hashes = np.array([term_hash(token) for token in counts], dtype='<u8')
+    freqs = np.array(list(counts.values()), dtype='<u2')
+    return hashes.tobytes(), freqs.tobytes()
+
+
+def _hard_split(sentence, max_chars):
+    """Split an over-long sentence at whitespace into max_chars pieces"""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def _paragraph_passages(paragraph, max_chars):
+    """Yield the passages of one paragraph, packing whole sentences where possible"""
+    paragraph = ' '.join(paragraph.split())
+    if not paragraph:
+        return
+    current = ''
+    for sentence in SENTENCE_RE.split(paragraph):
+        for piece in _hard_split(sentence, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                yield current
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        yield current
+
+
+def iter_passages(chunks, max_chars=PASSAGE_CHARS):
+    """Split a stream of text chunks into passages without holding the whole text.
+
+    Only the unfinished paragraph is buffered; a paragraph growing past a few
+    passages without a blank line is cut at whitespace.
+    """
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        paragraphs = PARAGRAPH_RE.split(buffer)
+        buffer = paragraphs.pop()
+        if len(buffer) > 4 * max_chars:
+            cut = buffer.rfind(' ', 0, len(buffer) - max_chars)
+            if cut > 0:
+                paragraphs.append(buffer[:cut])
+                buffer = buffer[cut:]
+        for paragraph in paragraphs:
+            yield from _paragraph_passages(paragraph, max_chars)
+    yield from _paragraph_passages(buffer, max_chars)
+
+
+def split_passages(text, max_chars=PASSAGE_CHARS):
+    """Split text into passages of at most max_chars, on paragraph and sentence boundaries"""
+    return list(iter_passages([text], max_chars))
+
+
+def iter_decoded(stream, encoding='utf-8', chunk_size=READ_CHUNK_BYTES):
+    """Read a binary stream incrementally and yield decoded, newline-normalised text.
+
+    Multibyte characters split across reads are completed by the incremental
+    decoder; invalid or truncated input raises UnicodeDecodeError.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    carry = ''
+    started = False
+    while True:
+        data = stream.read(chunk_size)
+        text = carry + decoder.decode(data, final=not data)
+        carry = ''
+        if not started and text:
+            text = text.lstrip('\ufeff')
+            started = True
+        if data and text.endswith('\r'):
+            # A \r\n pair may be split across reads
+            carry, text = '\r', text[:-1]
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        if text:
+            yield text
+        if not data:
+            break
+
+
+class BM25Index:
+    """In-memory BM25 index over a tenant's passages.
+
+    Built from the term statistics stored with each passage at ingest
+    (term_stats), so loading a tenant's index tokenizes nothing; document
+    frequencies and lengths are derived from them with vectorized passes.
+    Per-posting BM25 weights are precomputed at build time, so scoring a query
+    is one vectorized add per query term over that term's postings.
+    """
+
+    def __init__(self, passages, k1=1.2, b=0.75):
+        # passages: iterable of (passage_id, text_id, term hashes, term frequencies) made by term_stats,
+        # ordered by text and position
+        self.passage_ids = []
+        text_ids = []
+        hash_blobs = []
+        freq_blobs = []
+        term_counts = []
+        for passage_id, text_id, hashes, freqs in passages:
+            self.passage_ids.append(passage_id)
+            text_ids.append(text_id)
+            hash_blobs.append(hashes or b'')
+            freq_blobs.append(freqs or b'')
+            term_counts.append(len(hashes or b'') // 8)
+
+        self.size = len(self.passage_ids)
+        self.text_ids = np.array(text_ids, dtype=np.int64)
+        hashes = np.frombuffer(b''.join(hash_blobs), dtype='<u8')
+        tfs = np.frombuffer(b''.join(freq_blobs), dtype='<u2').astype(np.float32)
+        docs = np.repeat(np.arange(self.size, dtype=np.int32), term_counts)
+        lengths = np.bincount(docs, weights=tfs, minlength=self.size).astype(np.float32)
+        avg_length = float(lengths.mean()) if self.size and lengths.any() else 1.0
+
+        # Group postings by term with one sort; document frequencies are the group sizes
+        order = np.argsort(hashes, kind='stable')
+        hashes, docs, tfs = hashes[order], docs[order], tfs[order]
+        starts = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1]))) if len(hashes) else np.zeros(0, dtype=np.int64)
+        self.terms = hashes[starts]
+        self.bounds = np.append(starts, len(hashes))
+        doc_freqs = np.diff(self.bounds)
+        idf = np.log1p((self.size - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        norms = k1 * (1 - b + b * lengths / avg_length)
+        self.docs = docs
+        self.weights = np.repeat(idf, doc_freqs) * tfs * (k1 + 1) / (tfs + norms[docs])
+
+    def scores(self, query):
+        """Return the BM25 score of every passage for the query"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            key = np.uint64(term_hash(term))
+            index = np.searchsorted(self.terms, key)
+            if index < len(self.terms) and self.terms[index] == key:
+                start, end = self.bounds[index], self.bounds[index + 1]
+                scores[self.docs[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, k=5, text_ids=None):
+        """Return the top-k (passage_id, score) pairs.
+
+        Without ``text_ids`` only passages sharing a term with the query are
+        returned. With ``text_ids`` the search is limited to those texts and
+        zero-score passages are kept, earliest passages first.
+        """
+        if not self.size:
+            return []
+        scores = self.scores(query)
+        if text_ids is not None:
+            candidates = np.flatnonzero(np.isin(self.text_ids, list(text_ids)))
+        else:
+            candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if text_ids is not None:
+            # Stable order so zero-score ties favour the earliest passages
+            candidates = candidates[np.lexsort((candidates, -scores[candidates]))[:k]]
+        elif len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = sorted(candidates.tolist(), key=lambda doc: (-scores[doc], doc))
+        return [(self.passage_ids[doc], float(scores[doc])) for doc in ranked]
+
+
+@lru_cache(maxsize=200000)
+def _token_features(token):
+    """Hashed (buckets, signed weights) of a token and its character n-grams"""
+    features = [token]
+    padded = f" {token} "
+    if len(padded) > CHAR_NGRAM:
+        features += [padded[i:i + CHAR_NGRAM] for i in range(len(padded) - CHAR_NGRAM + 1)]
+    buckets, weights = [], []
+    for n, feature in enumerate(features):
+        # crc32 is stable across processes, unlike hash()
+        digest = zlib.crc32(feature.encode('utf-8'))
+        buckets.append(digest % EMBEDDING_DIM)
+        weight = 1.0 if n == 0 else CHAR_NGRAM_WEIGHT
+        weights.append(weight if digest & 0x80000000 else -weight)
+    return buckets, weights
+
+
+def embed_texts(texts):
+    """Embed texts into L2-normalised float32 vectors of EMBEDDING_DIM.
+
+    Uses the hashing trick, so no vocabulary or network access is needed and
+    vectors stay comparable across uploads and workers.
+    """
+    matrix = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets, values = [], []
+        for token, count in Counter(tokenize(text)).items():
+            token_buckets, token_weights = _token_features(token)
+            buckets += token_buckets
+            if count == 1:
+                values += token_weights
+            else:
+                scale = 1 + math.log(count)
+                values += [weight * scale for weight in token_weights]
+        if buckets:
+            matrix[row] = np.bincount(buckets, weights=values, minlength=EMBEDDING_DIM)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class VectorIndex:
+    """Per-tenant passage embedding matrix answered with one matrix-vector product"""
+
+    def __init__(self, passages):
+        # passages: iterable of (passage_id, text_id, embedding bytes or None)
+        self.passage_ids = []
+        text_ids = []
+        blobs = []
+        empty = bytes(EMBEDDING_DIM * 4)
+        for passage_id, text_id, embedding in passages:
+            self.passage_ids.append(passage_id)
+            text_ids.append(text_id)
+            blobs.append(embedding if embedding and len(embedding) == len(empty) else empty)
+        self.size = len(self.passage_ids)
+        self.text_ids = np.array(text_ids, dtype=np.int64)
+        self.matrix = np.frombuffer(b''.join(blobs), dtype=np.float32).reshape(self.size, EMBEDDING_DIM)
+
+    def search(self, query, k=5, min_similarity=0.0):
+        """Return the top-k (passage_id, cosine similarity) pairs above min_similarity"""
+        return self.search_many([query], k, min_similarity)[0]
+
+    def search_many(self, queries, k=5, min_similarity=0.0):
+        """Return search() results for every query.
+
+        Queries are embedded together and scored a block at a time with one
+        matrix product per block, so the similarity matrix held in memory
+        stays under SEARCH_BLOCK_CELLS entries.
+        """
+        if not self.size:
+            return [[] for _ in queries]
+        embeddings = embed_texts(queries)
+        block_size = max(1, SEARCH_BLOCK_CELLS // self.size)
+        results = []
+        for start in range(0, len(queries), block_size):
+            for similarities in embeddings[start:start + block_size] @ self.matrix.T:
+                candidates = np.flatnonzero(similarities > min_similarity)
+                if len(candidates) > k:
+                    candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+                ranked = sorted(candidates.tolist(), key=lambda doc: (-similarities[doc], doc))
+                results.append([(self.passage_ids[doc], float(similarities[doc])) for doc in ranked])
+        return results
+
+
+def estimate_tokens(text):
+    """Token estimate for prompt budgeting, without a tokenizer dependency.
+
+    Errs high: Turkish averages a little over CHARS_PER_TOKEN characters per token.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly ``max_tokens``, at the last sentence boundary that fits.
+
+    Falls back to a word boundary (with an ellipsis) when even the first
+    sentence is too long; returns '' when nothing useful fits.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = 0
+    for boundary in SENTENCE_RE.finditer(text):
+        if boundary.start() > max_chars:
+            break
+        cut = boundary.start()
+    if cut:
+        return text[:cut].rstrip()
+    words = text[:max_chars - 1].rsplit(None, 1)[0].rstrip()
+    return words + '…' if words else ''
+
+
+def pack_context(snippets, budget_tokens, min_tokens=MIN_SNIPPET_TOKENS):
+    """Greedily pack snippets, most relevant first, into a token budget.
+
+    A snippet that does not fit whole is truncated at a sentence boundary if
+    at least ``min_tokens`` of budget remain, otherwise dropped; smaller
+    snippets further down may still fit. Returns (texts, stats) where texts
+    has one entry per snippet (None when dropped) and stats holds the packed
+    ``tokens`` and counts of ``snippets``, ``truncated`` and ``dropped``.
+    """
+    texts = []
+    stats = {"tokens": 0, "snippets": 0, "truncated": 0, "dropped": 0}
+    for snippet in snippets:
+        remaining = budget_tokens - stats["tokens"]
+        tokens = estimate_tokens(snippet)
+        if tokens > remaining:
+            snippet = truncate_to_tokens(snippet, remaining) if remaining >= min_tokens else ''
+            if not snippet:
+                texts.append(None)
+                stats["dropped"] += 1
+                continue
+            tokens = estimate_tokens(snippet)
+            stats["truncated"] += 1
+        texts.append(snippet)
+        stats["tokens"] += tokens
+        stats["snippets"] += 1
+    return texts, stats
+
+
+IMPORT_FIELDS = ('title', 'content', 'keywords')
+IMPORT_LIMITS = {'title': 200, 'keywords': 500}
+
+
+def _validate_import_row(record):
+    """Return (row, error) for one imported record with title, content and keywords"""
+    if not isinstance(record, dict):
+        return None, "Satır bir nesne olmalı"
+    row = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        value = value.strip() if value else None
+        if field != 'keywords' and not value:
+            return None, f"'{field}' alanı zorunlu"
+        if value and field in IMPORT_LIMITS and len(value) > IMPORT_LIMITS[field]:
+            return None, f"'{field}' en fazla {IMPORT_LIMITS[field]} karakter olabilir"
+        row[field] = value
+    return row, None
+
+
+def iter_import_rows(stream, fmt):
+    """Yield (row_number, row, error) for a JSONL or CSV import stream.
+
+    The stream is decoded incrementally; exactly one of row and error is set.
+    CSV files need a header with title, content and keywords columns.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield (number, *_validate_import_row(record))
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, "Geçersiz JSON"
+            continue
+        yield (number, *_validate_import_row(record))
+
+
+def parse_keywords(raw_keywords):
+    """Split a comma separated keyword string into unique, case-folded keywords"""
+    if not raw_keywords:
+        return []
+
+    keywords = []
+    seen = set()
+    for keyword in raw_keywords.split(','):
+        keyword = fold_case(keyword.strip())
+        if keyword and fold_for_matching(keyword) not in seen:
+            seen.add(fold_for_matching(keyword))
+            keywords.append(keyword)
+    return keywords
+
+
+def match_keywords(message, keyword_map, keywords=None):
+    """Return the ids of texts whose keywords occur in the message.
+
+    ``keyword_map`` maps each keyword to the ids of the texts that list it.
+    Pass the keywords already found by a compiled KeywordMatcher as
+    ``keywords``; otherwise a matcher is built for this one call.
+    """
+    if keywords is None:
+        keywords = KeywordMatcher(keyword_map).find(message)
+    matched_ids = set()
+    for keyword in keywords:
+        matched_ids.update(keyword_map[keyword])
+    return sorted(matched_ids)
@@ -1,13 +1,33 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Response, render_template, request, jsonify, redirect, url_for, flash, session, g, has_request_context, got_request_exception
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect, CSRFError
-import requests
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+import click
 import os
-from dotenv import load_dotenv
+import sqlite3
+import csv
+import json
+import time
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import sys
-from openai_service import chat_with_sahilkamp_bot
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from factory import create_app, compile_templates
+from openai_service import chat_with_sahilkamp_bot, stream_sahilkamp_bot, build_fallback_router, cache_stats, upstream_stats
+from cache import LRUCache, SingleFlight
+from writebehind import WriteBehindBuffer
+from metering import RateLimiter, UsageMeter
+from telemetry import metrics, SamplingProfiler, COUNT_BUCKETS
+from analytics import rollup_turns, histogram_percentile, bucket_series, bucket_start, DEMO_TENANT
+from matcher import KeywordMatcher, parse_intents, format_intents
+from knowledge import parse_keywords, match_keywords, split_passages, iter_passages, iter_decoded, iter_import_rows, BM25Index, VectorIndex, embed_texts, term_stats, pack_context, estimate_tokens, READ_CHUNK_BYTES
 
 def get_initials(full_name):
     """Generate initials from full name"""
@@ -16,23 +36,8 @@ def get_initials(full_name):
     words = full_name.strip().split()[:2]
     return ''.join(word[0].upper() for word in words if word)
 
-# .env yükle
-load_dotenv()
-
-app = Flask(__name__)
-
-# Production-ready secret key configuration
-secret_key = os.getenv("FLASK_SECRET_KEY")
-if not secret_key:
-    if os.getenv("FLASK_ENV") == "production":
-        print("ERROR: FLASK_SECRET_KEY environment variable is required for production")
-        sys.exit(1)
-    else:
-        # Only use fallback for development
-        secret_key = "dev-secret-key-change-in-production"
-        print("WARNING: Using development secret key. Set FLASK_SECRET_KEY for production.")
-
-app.secret_key = secret_key
+# Secret key, proxy, template cache and public pages (index, pricing, health) come from the factory
+app = create_app()
 
 # Configure file upload settings
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
@@ -47,9 +52,52 @@ csrf = CSRFProtect(app)
 
 # ---------------- DATABASE ---------------- #
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(basedir, 'instance', 'users.db')}"
+database_url = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.join(basedir, 'instance', 'users.db')}"
+for scheme in ("postgres://", "postgresql://"):  # Heroku/Replit tarzı URL; sürücü requirements'taki psycopg2
+    if database_url.startswith(scheme):
+        database_url = "postgresql+psycopg2://" + database_url[len(scheme):]
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+if not database_url.startswith("sqlite"):
+    # gunicorn thread'leri + sohbet kaydı/yükleme arka plan işleri aynı havuzu paylaşır
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 5)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the chat log writer; NORMAL sync is safe under WAL"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
 db = SQLAlchemy(app)
+MIGRATIONS_DIR = os.path.join(basedir, 'migrations')
+
+def init_migrations():
+    """Register Flask-Migrate (imports alembic, ~0.2s, so only when migrations are used)"""
+    if "migrate" not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+def upgrade_database():
+    """Apply pending migrations, like `flask --app main db upgrade`"""
+    from flask_migrate import upgrade
+    init_migrations()
+    upgrade(directory=MIGRATIONS_DIR)
+
+# Under the flask CLI (e.g. `flask --app main db upgrade`) the app is loaded inside a click context
+if click.get_current_context(silent=True) is not None:
+    init_migrations()
 
 # Kullanıcı modeli
 class User(db.Model):
@@ -73,6 +121,10 @@ class BotSettings(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.Index('ix_bot_settings_user_created', 'user_id', 'created_at'),
+    )
+
 # Kaydedilen bot metinleri modeli  
 class SavedBotText(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,12 +134,1081 @@ class SavedBotText(db.Model):
     keywords = db.Column(db.String(500), nullable=True)  # anahtar kelimeler
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
-# ---------------- ROUTES ---------------- #
+    __table_args__ = (
+        db.Index('ix_saved_bot_text_user_created', 'user_id', 'created_at'),
+    )
 
-@app.route("/")
-def index():
-    user = session.get("user")
-    return render_template("index.html", user=user)
+# Anahtar kelime indeksi (keyword -> metin id)
+class KeywordIndex(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    keyword = db.Column(db.String(200), nullable=False)
+    text_id = db.Column(db.Integer, db.ForeignKey('saved_bot_text.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_keyword_index_user_keyword', 'user_id', 'keyword'),
+    )
+
+# Metin parçaları (yüklenen metinler arama için parçalara bölünür)
+class TextPassage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    text_id = db.Column(db.Integer, db.ForeignKey('saved_bot_text.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=True)  # float32 vektör
+    # BM25 terim istatistikleri (knowledge.term_stats): uint64 terim hash'leri ve uint16 frekanslar
+    term_hashes = db.Column(db.LargeBinary, nullable=True)
+    term_freqs = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_text_passage_user_text', 'user_id', 'text_id', 'position'),
+    )
+
+# Bilgi versiyonları: bot ayarları (amaç/bilgi/niyetler) ve kayıtlı metinler ayrı ayrı sayılır
+class KnowledgeVersion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    text_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Yedek yanıt niyetleri (yapay zekâ yanıt veremediğinde anahtar kelimeye göre hazır yanıt)
+class BotIntents(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    intents = db.Column(db.Text, nullable=False, default='[]')  # JSON: [{"keywords": [...], "reply": "..."}]
+    default_reply = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+# Dosya yükleme işleri (dosya parça parça okunup metin parçalarına bölünür)
+class UploadJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    text_id = db.Column(db.Integer, db.ForeignKey('saved_bot_text.id'), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    keywords = db.Column(db.String(500), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, processing, done, failed
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    passage_count = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_upload_job_user_created', 'user_id', 'created_at'),
+        db.Index('ix_upload_job_text', 'text_id'),
+    )
+
+# Sohbetler (demo sohbeti için user_id boş kalır)
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    channel = db.Column(db.String(20), nullable=False)  # demo, bot, eval (batch test runs)
+    session_key = db.Column(db.String(80), unique=True, nullable=False)
+    first_message = db.Column(db.String(300), nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    last_message_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_conversation_user_last_message', 'user_id', 'last_message_at'),
+    )
+
+# Sohbet mesajları (kullanıcı mesajı + bot yanıtı bir satır)
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    user_message = db.Column(db.Text, nullable=False)
+    bot_reply = db.Column(db.Text, nullable=False)
+    latency_ms = db.Column(db.Integer, nullable=False, default=0)
+    cache_hit = db.Column(db.Boolean, nullable=False, default=False)
+    fallback = db.Column(db.Boolean, nullable=False, default=False)
+    tokens = db.Column(db.Integer, nullable=False, default=0)
+    keywords = db.Column(db.String(500), nullable=True)  # eşleşen anahtar kelimeler (virgülle)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_chat_message_user_created', 'user_id', 'created_at'),
+        db.Index('ix_chat_message_conversation', 'conversation_id', 'id'),
+    )
+
+# Günlük kullanım sayaçları (sınırsız kullanıcılar sayılmaz)
+class UsageCounter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    tokens = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_usage_counter_user_day'),
+    )
+
+# Analitik özetleri: saatlik/günlük kovalar, sohbet kayıtları yazılırken artırılır.
+# tenant_id demo sohbeti için 0'dır (unique kısıt NULL değerlerle çalışmaz).
+class ChatRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, nullable=False)
+    period = db.Column(db.String(4), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    cache_hits = db.Column(db.Integer, nullable=False, default=0)
+    fallbacks = db.Column(db.Integer, nullable=False, default=0)
+    tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_total_ms = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'period', 'bucket_start', name='uq_chat_rollup_bucket'),
+    )
+
+# Yanıt süresi histogramı (p50/p95 için), kova başına bir satır
+class LatencyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, nullable=False)
+    period = db.Column(db.String(4), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    latency_bucket = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'period', 'bucket_start', 'latency_bucket', name='uq_latency_rollup_bucket'),
+    )
+
+# Günlük eşleşen anahtar kelime sayıları
+class KeywordRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = db.Column(db.Integer, nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    keyword = db.Column(db.String(200), nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'bucket_start', 'keyword', name='uq_keyword_rollup_bucket'),
+    )
+
+# Retrieval settings
+RETRIEVAL_TOP_K = 5
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", 1500))  # bot bilgisi + metin parçaları için üst sınır
+SEMANTIC_MIN_SIMILARITY = 0.1
+
+def index_keywords(saved_text):
+    """Add keyword index rows for a saved text (caller commits)"""
+    for keyword in parse_keywords(saved_text.keywords):
+        entry = KeywordIndex()
+        entry.user_id = saved_text.user_id
+        entry.keyword = keyword[:200]
+        entry.text_id = saved_text.id
+        db.session.add(entry)
+
+def insert_passage_rows(user_id, passages):
+    """Embed and bulk insert (text_id, position, content) passages with their BM25 term
+    statistics, in one Core executemany (caller commits)"""
+    embeddings = embed_texts([content for _, _, content in passages])
+    rows = []
+    for row, (text_id, position, content) in enumerate(passages):
+        term_hashes, term_freqs = term_stats(content)
+        rows.append({
+            "user_id": user_id,
+            "text_id": text_id,
+            "position": position,
+            "content": content,
+            "embedding": embeddings[row].tobytes(),
+            "term_hashes": term_hashes,
+            "term_freqs": term_freqs,
+        })
+    db.session.execute(TextPassage.__table__.insert(), rows)
+
+def insert_passages(user_id, text_id, first_position, contents):
+    """Embed and bulk insert consecutive passages of one text (caller commits)"""
+    insert_passage_rows(user_id, [(text_id, first_position + offset, content) for offset, content in enumerate(contents)])
+
+def index_saved_text(saved_text):
+    """Add keyword index and passage rows for a saved text (caller commits)"""
+    index_keywords(saved_text)
+    contents = split_passages(saved_text.content)
+    if contents:
+        insert_passages(saved_text.user_id, saved_text.id, 0, contents)
+
+def load_keyword_map(user_id):
+    """Load a user's keyword -> text ids map without touching text contents"""
+    keyword_map = {}
+    rows = db.session.query(KeywordIndex.keyword, KeywordIndex.text_id).filter_by(user_id=user_id)
+    for keyword, text_id in rows:
+        keyword_map.setdefault(keyword, []).append(text_id)
+    return keyword_map
+
+# Compiled per-tenant bot contexts, in two parts with their own KnowledgeVersion stamp checked
+# on every use: the settings (cheap) and the saved texts (keywords and passage indexes), so a
+# settings edit never rebuilds the indexes. Text indexes are bounded by tenants and by their
+# passages in total (~2.5 KB of index each, per worker)
+BOT_CONTEXT_CACHE_SIZE = int(os.getenv("BOT_CONTEXT_CACHE_SIZE", 256))
+BOT_CONTEXT_CACHE_PASSAGES = int(os.getenv("BOT_CONTEXT_CACHE_PASSAGES", 50000))
+_bot_settings_cache = LRUCache(BOT_CONTEXT_CACHE_SIZE)
+_text_indexes = LRUCache(BOT_CONTEXT_CACHE_SIZE, max_bytes=BOT_CONTEXT_CACHE_PASSAGES, sizeof=lambda text_index: text_index.size)
+_bot_context_builds = SingleFlight()
+
+class BotProfile:
+    """A tenant's bot settings compiled for bot_chat: prompt preamble and fallback intents"""
+
+    def __init__(self, user_id, version):
+        self.user_id = user_id
+        self.version = version
+        self.preamble = []
+        bot_settings = BotSettings.query.filter_by(user_id=user_id).first()
+        if bot_settings:
+            if bot_settings.bot_purpose:
+                self.preamble.append(f"Bot Amacı: {bot_settings.bot_purpose}")
+            if bot_settings.bot_title and bot_settings.bot_info_text:
+                self.preamble.append(f"{bot_settings.bot_title}: {bot_settings.bot_info_text}")
+        bot_intents = db.session.get(BotIntents, user_id)
+        if bot_intents:
+            self.fallback_router = build_fallback_router(json.loads(bot_intents.intents), bot_intents.default_reply)
+        else:
+            self.fallback_router = build_fallback_router()
+
+class TextIndex:
+    """A tenant's saved texts compiled for retrieval: keywords, passage indexes and titles"""
+
+    def __init__(self, user_id, version):
+        self.user_id = user_id
+        self.version = version
+        self.keyword_map = load_keyword_map(user_id)
+        self.keyword_matcher = KeywordMatcher(self.keyword_map)
+        
+        # Both indexes and the titles come from one query, so every indexed passage has a title.
+        # BM25 uses the term statistics stored at ingest; passage texts are not loaded
+        rows = (
+            db.session.query(TextPassage.id, TextPassage.text_id, TextPassage.term_hashes, TextPassage.term_freqs,
+                             TextPassage.embedding, SavedBotText.title)
+            .join(SavedBotText, SavedBotText.id == TextPassage.text_id)
+            .filter(TextPassage.user_id == user_id, TextPassage.text_id.not_in(processing_upload_text_ids()))
+            .order_by(TextPassage.text_id, TextPassage.position)
+            .all()
+        )
+        computed = {}
+        if any(term_hashes is None for _, _, term_hashes, _, _, _ in rows):
+            # Written before term statistics were stored (migration 0004 fills these in)
+            unscored = db.session.query(TextPassage.id, TextPassage.content).filter(
+                TextPassage.user_id == user_id, TextPassage.term_hashes.is_(None))
+            computed = {passage_id: term_stats(content) for passage_id, content in unscored}
+        self.titles = {text_id: title for _, text_id, _, _, _, title in rows}
+        self.size = len(rows)
+        self._indexes = {
+            'bm25': BM25Index((passage_id, text_id) + computed.get(passage_id, (term_hashes, term_freqs))
+                              for passage_id, text_id, term_hashes, term_freqs, _, _ in rows),
+            'vector': VectorIndex((passage_id, text_id, embedding) for passage_id, text_id, _, _, embedding, _ in rows),
+        }
+
+    def index(self, kind='bm25'):
+        """Return the tenant's 'bm25' or 'vector' passage index"""
+        return self._indexes[kind]
+
+class BotContext:
+    """Everything bot_chat needs about a tenant that only changes on edit"""
+
+    def __init__(self, profile, texts):
+        self.user_id = profile.user_id
+        self.preamble = profile.preamble
+        self.fallback_router = profile.fallback_router
+        self.keyword_map = texts.keyword_map
+        self.keyword_matcher = texts.keyword_matcher
+        self.titles = texts.titles
+        self.index = texts.index
+
+def get_knowledge_versions(user_id):
+    """Return the tenant's (settings version, texts version)"""
+    versions = db.session.query(KnowledgeVersion.version, KnowledgeVersion.text_version).filter_by(user_id=user_id).first()
+    return tuple(versions) if versions else (0, 0)
+
+def bump_knowledge_version(user_id, texts=False):
+    """Mark a tenant's bot settings, or with ``texts`` its saved texts, as changed (caller commits)"""
+    column = KnowledgeVersion.text_version if texts else KnowledgeVersion.version
+    updated = KnowledgeVersion.query.filter_by(user_id=user_id).update({column: column + 1})
+    if not updated:
+        entry = KnowledgeVersion()
+        entry.user_id = user_id
+        entry.version = 0 if texts else 1
+        entry.text_version = 1 if texts else 0
+        db.session.add(entry)
+
+def invalidate_bot_context(user_id=None, texts=False):
+    """Drop this worker's cached settings (or with ``texts`` text index); other workers notice the version bump"""
+    cache = _text_indexes if texts else _bot_settings_cache
+    if user_id is None:
+        cache.clear()
+    else:
+        cache.pop(user_id)
+
+def build_cached(cache, part, user_id, version):
+    """Compile one part of a tenant's context and cache it for this worker"""
+    compiled = part(user_id, version)
+    cache.set(user_id, compiled)
+    return compiled
+
+def get_cached_part(cache, part, user_id, version):
+    """Return a cached context part, compiling it if missing or stale.
+
+    Concurrent requests for a part being compiled wait for that build
+    instead of each loading the tenant's data.
+    """
+    compiled = cache.get(user_id)
+    if compiled is None or compiled.version != version:
+        compiled, _ = _bot_context_builds.do((part.__name__, user_id, version),
+                                             lambda: build_cached(cache, part, user_id, version))
+    return compiled
+
+def get_bot_context(user_id):
+    """Return the tenant's compiled context, recompiling only the parts whose version changed"""
+    settings_version, text_version = get_knowledge_versions(user_id)
+    return BotContext(get_cached_part(_bot_settings_cache, BotProfile, user_id, settings_version),
+                      get_cached_part(_text_indexes, TextIndex, user_id, text_version))
+
+def load_passages(ranked_lists):
+    """Load several ranked (passage_id, score) lists with one query, keeping each rank order"""
+    passage_ids = {passage_id for ranked in ranked_lists for passage_id, _ in ranked}
+    if not passage_ids:
+        return [[] for _ in ranked_lists]
+    passages = {passage.id: passage for passage in TextPassage.query.filter(TextPassage.id.in_(passage_ids))}
+    # Passages deleted since the context was built are skipped
+    return [[passages[passage_id] for passage_id, _ in ranked if passage_id in passages] for ranked in ranked_lists]
+
+def retrieve_passages(bot_context, messages, metas):
+    """Return the ranked passages for each message.
+
+    Passages of keyword-matched texts come first, otherwise the semantically
+    closest ones (paraphrases), then the lexically closest. The similarity
+    search for every message that needs it is one batched pass, and all
+    passages are loaded with one query. Matched keywords go to each meta.
+    """
+    ranked_lists = []
+    for message, meta in zip(messages, metas):
+        keywords = sorted(bot_context.keyword_matcher.find(message))
+        matched_ids = match_keywords(message, bot_context.keyword_map, keywords)
+        if meta is not None:
+            meta["keywords"] = keywords
+        ranked_lists.append(bot_context.index('bm25').search(message, k=RETRIEVAL_TOP_K, text_ids=matched_ids) if matched_ids else [])
+    
+    unmatched = [row for row, ranked in enumerate(ranked_lists) if not ranked]
+    if unmatched:
+        similar = bot_context.index('vector').search_many([messages[row] for row in unmatched], k=RETRIEVAL_TOP_K,
+                                                          min_similarity=SEMANTIC_MIN_SIMILARITY)
+        for row, ranked in zip(unmatched, similar):
+            ranked_lists[row] = ranked or bot_context.index('bm25').search(messages[row], k=RETRIEVAL_TOP_K)
+    return load_passages(ranked_lists)
+
+def rebuild_knowledge_index(user_id=None):
+    """Rebuild keyword and passage indexes from saved texts (all users if user_id is None)"""
+    keyword_query = KeywordIndex.query
+    passage_query = TextPassage.query
+    text_query = SavedBotText.query
+    if user_id is not None:
+        keyword_query = keyword_query.filter_by(user_id=user_id)
+        passage_query = passage_query.filter_by(user_id=user_id)
+        text_query = text_query.filter_by(user_id=user_id)
+    version_query = KnowledgeVersion.query if user_id is None else KnowledgeVersion.query.filter_by(user_id=user_id)
+    
+    # Uploaded files only keep a preview in SavedBotText.content, their passages are the source
+    chunked_ids = {text_id for (text_id,) in db.session.query(UploadJob.text_id).filter(UploadJob.text_id.isnot(None))}
+    keyword_query.delete(synchronize_session=False)
+    passage_query.filter(TextPassage.text_id.not_in(chunked_ids)).delete(synchronize_session=False)
+    # Texts still being uploaded get their keywords when their job finishes
+    for saved_text in text_query.filter(SavedBotText.id.not_in(processing_upload_text_ids())).yield_per(100):
+        if saved_text.id in chunked_ids:
+            index_keywords(saved_text)
+        else:
+            index_saved_text(saved_text)
+    version_query.update({KnowledgeVersion.text_version: KnowledgeVersion.text_version + 1}, synchronize_session=False)
+    db.session.commit()
+    invalidate_bot_context(user_id, texts=True)
+
+@app.cli.command("reindex")
+def reindex_command():
+    """Rebuild the knowledge-base keyword and passage indexes"""
+    rebuild_knowledge_index()
+    print("Knowledge index rebuilt.")
+
+@app.cli.command("fail-stale-uploads")
+def fail_stale_uploads_command():
+    """Mark upload jobs left queued/processing by a killed worker as failed"""
+    print(f"{fail_stale_upload_jobs()} stale upload jobs failed.")
+
+# Upload ingestion settings
+UPLOAD_BATCH_PASSAGES = 200
+UPLOAD_PREVIEW_CHARS = 1000
+UPLOAD_BACKGROUND_BYTES = int(os.getenv("UPLOAD_BACKGROUND_BYTES", 512 * 1024))
+# Jobs still queued/processing after this long belong to a killed worker and are marked failed
+UPLOAD_JOB_TIMEOUT = int(os.getenv("UPLOAD_JOB_TIMEOUT", 3600))
+_upload_executor = ThreadPoolExecutor(max_workers=int(os.getenv("UPLOAD_WORKERS", 2)), thread_name_prefix="upload")
+
+def ingest_upload(job_id, path, route=None):
+    """Stream an uploaded .txt file from disk into a SavedBotText and its passages.
+
+    The file is decoded and chunked incrementally and each batch of passages
+    is committed as it is inserted, so memory and the database write lock
+    stay bounded by one batch. Retrieval skips the text until the final commit
+    marks the job done; a failed job deletes what it wrote. SavedBotText.content
+    keeps only a preview. Failures are logged under ``route`` (the current
+    request's by default).
+    """
+    job = db.session.get(UploadJob, job_id)
+    saved_text = SavedBotText()
+    saved_text.user_id = job.user_id
+    saved_text.title = job.title
+    saved_text.content = ''
+    saved_text.keywords = job.keywords
+    db.session.add(saved_text)
+    db.session.flush()
+    job.text_id = saved_text.id
+    job.status = 'processing'
+    db.session.commit()
+    
+    try:
+        preview = ''
+        batch = []
+        passage_count = 0
+        with open(path, 'rb') as upload:
+            for passage in iter_passages(iter_decoded(upload)):
+                if len(preview) < UPLOAD_PREVIEW_CHARS:
+                    preview = f"{preview}\n\n{passage}" if preview else passage
+                batch.append(passage)
+                if len(batch) >= UPLOAD_BATCH_PASSAGES:
+                    insert_passages(job.user_id, saved_text.id, passage_count, batch)
+                    passage_count += len(batch)
+                    job.passage_count = passage_count
+                    db.session.commit()
+                    batch = []
+        if batch:
+            insert_passages(job.user_id, saved_text.id, passage_count, batch)
+            passage_count += len(batch)
+        
+        saved_text.content = preview
+        index_keywords(saved_text)
+        job.passage_count = passage_count
+        job.status = 'done'
+        job.finished_at = db.func.current_timestamp()
+        bump_knowledge_version(job.user_id, texts=True)
+        db.session.commit()
+        invalidate_bot_context(job.user_id, texts=True)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        fail_upload_job(job, "Dosya UTF-8 formatında değil. Lütfen farklı bir dosya deneyin.")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        record_route_error(e, route)
+        fail_upload_job(job, "Dosya yüklenirken bir hata oluştu.")
+        db.session.commit()
+    finally:
+        os.remove(path)
+    return job
+
+def fail_upload_job(job, error):
+    """Mark an upload job failed and delete the text and passages it wrote (caller commits)"""
+    if job.text_id is not None:
+        TextPassage.query.filter_by(text_id=job.text_id).delete(synchronize_session=False)
+        KeywordIndex.query.filter_by(text_id=job.text_id).delete(synchronize_session=False)
+        SavedBotText.query.filter_by(id=job.text_id).delete(synchronize_session=False)
+        job.text_id = None
+    job.passage_count = 0
+    job.status = 'failed'
+    job.error = error
+    job.finished_at = db.func.current_timestamp()
+
+def fail_stale_upload_jobs(user_id=None):
+    """Fail queued/processing jobs older than UPLOAD_JOB_TIMEOUT (their worker died); returns the count"""
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_JOB_TIMEOUT)
+    query = UploadJob.query.filter(UploadJob.status.in_(('queued', 'processing')), UploadJob.created_at < cutoff)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    jobs = query.all()
+    for job in jobs:
+        fail_upload_job(job, "Dosya işlenirken zaman aşımı oldu. Lütfen tekrar yükleyin.")
+    if jobs:
+        db.session.commit()
+    return len(jobs)
+
+def processing_upload_text_ids():
+    """Texts whose upload is still being ingested; retrieval skips their partial passages"""
+    return db.select(UploadJob.text_id).where(UploadJob.status == 'processing', UploadJob.text_id.isnot(None))
+
+def run_upload_job(job_id, path, route):
+    """Background entry point for ingest_upload; nobody waits on the future, so errors are logged here"""
+    with app.app_context():
+        try:
+            ingest_upload(job_id, path, route)
+        except Exception as e:
+            record_route_error(e, route)
+
+# Bulk import settings
+IMPORT_BATCH_ROWS = 1000
+IMPORT_MAX_ERRORS = 100
+
+def import_saved_text_batch(user_id, rows):
+    """Insert a batch of validated rows with their keyword and passage rows (caller commits)"""
+    text_ids = db.session.execute(
+        SavedBotText.__table__.insert().returning(SavedBotText.id, sort_by_parameter_order=True),
+        [dict(row, user_id=user_id) for row in rows]
+    ).scalars().all()
+    
+    keyword_rows = []
+    passages = []
+    for text_id, row in zip(text_ids, rows):
+        for keyword in parse_keywords(row["keywords"]):
+            keyword_rows.append({"user_id": user_id, "keyword": keyword[:200], "text_id": text_id})
+        for position, content in enumerate(split_passages(row["content"])):
+            passages.append((text_id, position, content))
+    if keyword_rows:
+        db.session.execute(KeywordIndex.__table__.insert(), keyword_rows)
+    if passages:
+        insert_passage_rows(user_id, passages)
+
+def import_saved_texts(user_id, stream, fmt):
+    """Import JSONL/CSV rows in one transaction; returns (imported count, row errors).
+
+    Rows are inserted in batches of IMPORT_BATCH_ROWS; the texts version is
+    bumped once at the end, so cached text indexes rebuild once.
+    """
+    imported = 0
+    errors = []
+    batch = []
+    try:
+        for number, row, error in iter_import_rows(stream, fmt):
+            if error:
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"row": number, "error": error})
+                continue
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_ROWS:
+                import_saved_text_batch(user_id, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            import_saved_text_batch(user_id, batch)
+            imported += len(batch)
+        if imported:
+            bump_knowledge_version(user_id, texts=True)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_bot_context(user_id, texts=True)
+    return imported, errors
+
+# Dashboard text istatistikleri; anahtar bilgi versiyonunu içerdiği için düzenlemede eskir
+DASHBOARD_STATS_TTL = int(os.getenv("DASHBOARD_STATS_TTL", 300))
+_dashboard_stats = LRUCache(max_items=1024, ttl=DASHBOARD_STATS_TTL)
+
+def load_text_stats(user_id, today):
+    """Return (saved text count, last 7 days histogram) for a user, cached per texts version"""
+    cache_key = (user_id, get_knowledge_versions(user_id)[1], today.date())
+    cached = _dashboard_stats.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    saved_texts_count = SavedBotText.query.filter_by(user_id=user_id).count()
+    
+    # One grouped range query; a range on created_at can use the (user_id, created_at) index
+    week_start = datetime.combine(today.date() - timedelta(days=6), datetime.min.time())
+    day = db.func.date(SavedBotText.created_at)
+    day_counts = dict(
+        (str(row_day), count) for row_day, count in
+        db.session.query(day, db.func.count(SavedBotText.id))
+        .filter(SavedBotText.user_id == user_id, SavedBotText.created_at >= week_start)
+        .group_by(day)
+    )
+    week_data = []
+    for i in range(7):
+        date = today - timedelta(days=6-i)
+        week_data.append({
+            'date': date.strftime('%d.%m'),
+            'count': day_counts.get(date.date().isoformat(), 0)
+        })
+    
+    stats = (saved_texts_count, week_data)
+    _dashboard_stats.set(cache_key, stats)
+    return stats
+
+# Kaydedilen metin listesi sayfalama ayarları
+SAVED_TEXTS_PAGE_SIZE = 20
+SAVED_TEXT_SNIPPET_CHARS = 200
+
+def keyset_cursor(row_time, row_id):
+    return f"{row_time.isoformat()}_{row_id}"
+
+def keyset_before(time_column, id_column, cursor):
+    """Filter for rows after ``cursor`` in (time, id) descending order, or None for a bad cursor"""
+    try:
+        row_time, last_id = cursor.rsplit('_', 1)
+        row_time, last_id = datetime.fromisoformat(row_time), int(last_id)
+    except ValueError:
+        return None
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite keeps CURRENT_TIMESTAMP values as text, compare in the same format
+        row_time = row_time.strftime('%Y-%m-%d %H:%M:%S.%f' if row_time.microsecond else '%Y-%m-%d %H:%M:%S')
+        row_time = db.literal(row_time, db.String)
+    return db.or_(time_column < row_time, db.and_(time_column == row_time, id_column < last_id))
+
+def load_saved_text_page(user_id, cursor=None):
+    """Return one page of a user's saved texts (newest first) and the cursor of the next page.
+
+    Keyset pagination on (created_at, id): the cursor is the last row's
+    "<created_at iso>_<id>", so each page costs the same however deep it is.
+    Only a snippet of the content is selected.
+    """
+    query = db.session.query(
+        SavedBotText.id, SavedBotText.title, SavedBotText.keywords, SavedBotText.created_at,
+        db.func.substr(SavedBotText.content, 1, SAVED_TEXT_SNIPPET_CHARS + 1).label('snippet')
+    ).filter(SavedBotText.user_id == user_id)
+    
+    if cursor:
+        after_cursor = keyset_before(SavedBotText.created_at, SavedBotText.id, cursor)
+        if after_cursor is not None:
+            query = query.filter(after_cursor)
+    
+    rows = query.order_by(SavedBotText.created_at.desc(), SavedBotText.id.desc()).limit(SAVED_TEXTS_PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(rows) > SAVED_TEXTS_PAGE_SIZE:
+        rows = rows[:SAVED_TEXTS_PAGE_SIZE]
+        next_cursor = keyset_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+# ---------------- CONVERSATIONS ---------------- #
+# Sohbet turları önce bellekte birikir, arka plandaki yazıcı toplu transaction ile kaydeder
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", 1.0))
+CONVERSATION_FLUSH_BATCH = int(os.getenv("CONVERSATION_FLUSH_BATCH", 500))
+CONVERSATION_MAX_PENDING = int(os.getenv("CONVERSATION_MAX_PENDING", 10000))
+CONVERSATIONS_PAGE_SIZE = 20
+CONVERSATION_MESSAGES_PAGE_SIZE = 50
+CONVERSATION_ACTIVE_MINUTES = 30
+CONVERSATION_LABELS = {'demo': "Demo ziyaretçisi", 'bot': "Bot test", 'eval': "Toplu test"}
+
+def get_conversation_key(channel):
+    """Per-browser conversation key kept in the session, one per chat channel"""
+    keys = session.get("conversation_keys") or {}
+    if channel not in keys:
+        keys[channel] = f"{channel}:{uuid.uuid4().hex}"
+        session["conversation_keys"] = keys
+    return keys[channel]
+
+def log_chat_turn(conversation_key, user_id, user_message, reply, started, meta):
+    """Queue a chat turn for the write-behind logger; never blocks on the database"""
+    created_at = datetime.utcnow()
+    if meta.get("metered"):
+        _usage.record(user_id, created_at.date(), 1, meta.get("tokens") or 0)
+    _chat_log.enqueue({
+        "conversation_key": conversation_key,
+        "user_id": user_id,
+        "user_message": user_message,
+        "bot_reply": reply or "",
+        "latency_ms": int((time.perf_counter() - started) * 1000),
+        "cache_hit": bool(meta.get("cache_hit")),
+        "fallback": bool(meta.get("fallback")),
+        "tokens": meta.get("tokens") or 0,
+        "keywords": meta.get("keywords") or [],
+        "metered": bool(meta.get("metered")),
+        "created_at": created_at,
+    })
+
+def _write_chat_turns(turns):
+    keys = {turn["conversation_key"] for turn in turns}
+    conversations = {
+        conversation.session_key: conversation
+        for conversation in Conversation.query.filter(Conversation.session_key.in_(keys))
+    }
+    for turn in turns:
+        conversation = conversations.get(turn["conversation_key"])
+        if conversation is None:
+            conversation = Conversation()
+            conversation.user_id = turn["user_id"]
+            conversation.channel = turn["conversation_key"].split(':', 1)[0]
+            conversation.session_key = turn["conversation_key"]
+            conversation.first_message = turn["user_message"][:300]
+            conversation.message_count = 0
+            conversation.created_at = turn["created_at"]
+            db.session.add(conversation)
+            conversations[conversation.session_key] = conversation
+        conversation.message_count += 1
+        conversation.last_message_at = turn["created_at"]
+    db.session.flush()  # new conversation ids
+    
+    db.session.execute(ChatMessage.__table__.insert(), [
+        {
+            "conversation_id": conversations[turn["conversation_key"]].id,
+            "user_id": turn["user_id"],
+            "user_message": turn["user_message"],
+            "bot_reply": turn["bot_reply"],
+            "latency_ms": turn["latency_ms"],
+            "cache_hit": turn["cache_hit"],
+            "fallback": turn["fallback"],
+            "tokens": turn["tokens"],
+            "keywords": ",".join(turn["keywords"]) or None,
+            "created_at": turn["created_at"],
+        }
+        for turn in turns
+    ])
+    write_rollups([dict(turn, tenant_id=turn["user_id"] or DEMO_TENANT) for turn in turns])
+    usage_rows = usage_increments(turns)
+    upsert_increment(UsageCounter, usage_rows, ['user_id', 'day'])
+    db.session.commit()
+    return usage_rows
+
+def flush_chat_turns(turns):
+    """Write a batch of chat turns in one transaction (runs on the write-behind thread)"""
+    with app.app_context():
+        try:
+            usage_rows = _write_chat_turns(turns)
+        except IntegrityError:
+            # Another worker created one of the conversations first; pick it up and retry
+            db.session.rollback()
+            usage_rows = _write_chat_turns(turns)
+        except Exception:
+            db.session.rollback()
+            raise
+    for row in usage_rows:
+        _usage.flushed(row["user_id"], row["day"], row["requests"], row["tokens"])
+
+_chat_log = WriteBehindBuffer(flush_chat_turns, max_batch=CONVERSATION_FLUSH_BATCH,
+                              interval=CONVERSATION_FLUSH_INTERVAL, max_pending=CONVERSATION_MAX_PENDING)
+
+def conversation_filter(user):
+    """Conversations a user may see: their bot's, plus the public demo chat for admins"""
+    if user.get("is_admin"):
+        return db.or_(Conversation.user_id == user["id"], Conversation.user_id.is_(None))
+    return Conversation.user_id == user["id"]
+
+def load_conversation_page(user, cursor=None, status=None):
+    """Return one page of conversations (most recently active first) and the next cursor"""
+    query = Conversation.query.filter(conversation_filter(user))
+    active_since = datetime.utcnow() - timedelta(minutes=CONVERSATION_ACTIVE_MINUTES)
+    if status == 'active':
+        query = query.filter(Conversation.last_message_at >= active_since)
+    elif status == 'done':
+        query = query.filter(Conversation.last_message_at < active_since)
+    if cursor:
+        after_cursor = keyset_before(Conversation.last_message_at, Conversation.id, cursor)
+        if after_cursor is not None:
+            query = query.filter(after_cursor)
+    
+    rows = query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).limit(CONVERSATIONS_PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(rows) > CONVERSATIONS_PAGE_SIZE:
+        rows = rows[:CONVERSATIONS_PAGE_SIZE]
+        next_cursor = keyset_cursor(rows[-1].last_message_at, rows[-1].id)
+    return rows, next_cursor
+
+def time_ago(moment, now):
+    minutes = int((now - moment).total_seconds() // 60)
+    if minutes < 1:
+        return "az önce"
+    if minutes < 60:
+        return f"{minutes} dakika önce"
+    if minutes < 24 * 60:
+        return f"{minutes // 60} saat önce"
+    return f"{minutes // (24 * 60)} gün önce"
+
+def load_conversation_stats(user):
+    """Totals for the conversations page stat cards.
+
+    Message totals are summed from the daily chat rollups (one row per
+    tenant and day), not counted over ChatMessage.
+    """
+    conversation_count = Conversation.query.filter(conversation_filter(user)).count()
+    message_count, latency_total, cache_hits, fallbacks = db.session.query(
+        db.func.sum(ChatRollup.message_count),
+        db.func.sum(ChatRollup.latency_total_ms),
+        db.func.sum(ChatRollup.cache_hits),
+        db.func.sum(ChatRollup.fallbacks),
+    ).filter(ChatRollup.tenant_id.in_(analytics_tenants(user)), ChatRollup.period == 'day').one()
+    message_count = message_count or 0
+    return {
+        'conversation_count': conversation_count,
+        'message_count': message_count,
+        'avg_latency_ms': int((latency_total or 0) / message_count) if message_count else 0,
+        'cache_hit_rate': round(100 * (cache_hits or 0) / message_count) if message_count else 0,
+        'fallback_rate': round(100 * (fallbacks or 0) / message_count) if message_count else 0,
+    }
+
+# ---------------- ANALYTICS ---------------- #
+# Grafikler ham sohbet kayıtlarını değil, saatlik/günlük özet tablolarını okur
+ANALYTICS_MAX_DAYS = 90
+ANALYTICS_HOURLY_MAX_DAYS = 2  # bu kadar güne kadar olan aralıklar saatlik çizilir
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", 14))
+ANALYTICS_TOP_KEYWORDS = 10
+
+def upsert_increment(model, rows, key_columns):
+    """Insert rollup rows, adding to the counters of rows that already exist.
+
+    A single INSERT ... ON CONFLICT DO UPDATE, so concurrent workers never
+    lose each other's increments.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(table)
+    counters = [column for column in rows[0] if column not in key_columns]
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={column: table.c[column] + statement.excluded[column] for column in counters}
+    )
+    db.session.execute(statement, rows)
+
+def write_rollups(turns):
+    """Add chat turns to the analytics rollups (caller commits)"""
+    counters, latencies, keywords = rollup_turns(turns)
+    upsert_increment(ChatRollup, counters, ['tenant_id', 'period', 'bucket_start'])
+    upsert_increment(LatencyRollup, latencies, ['tenant_id', 'period', 'bucket_start', 'latency_bucket'])
+    upsert_increment(KeywordRollup, keywords, ['tenant_id', 'bucket_start', 'keyword'])
+
+def analytics_tenants(user):
+    """Rollup tenant ids a user may see: their bot's, plus the public demo chat for admins"""
+    return [user["id"], DEMO_TENANT] if user.get("is_admin") else [user["id"]]
+
+def percent(part, total):
+    return round(100 * part / total, 1) if total else 0
+
+def load_analytics(tenant_ids, days, now=None):
+    """Analytics for the last ``days`` days from the rollup tables.
+
+    Every query reads at most one row per bucket (times latency buckets or
+    keywords), so the cost depends on the range, not on chat volume.
+    """
+    now = now or datetime.utcnow()
+    period = 'hour' if days <= ANALYTICS_HOURLY_MAX_DAYS else 'day'
+    end = bucket_start(now, period) + (timedelta(hours=1) if period == 'hour' else timedelta(days=1))
+    start = end - timedelta(days=days)
+    
+    counter_rows = db.session.query(
+        ChatRollup.bucket_start,
+        db.func.sum(ChatRollup.message_count), db.func.sum(ChatRollup.cache_hits),
+        db.func.sum(ChatRollup.fallbacks), db.func.sum(ChatRollup.tokens), db.func.sum(ChatRollup.latency_total_ms)
+    ).filter(
+        ChatRollup.tenant_id.in_(tenant_ids), ChatRollup.period == period, ChatRollup.bucket_start >= start
+    ).group_by(ChatRollup.bucket_start).all()
+    counters = {row[0]: row[1:] for row in counter_rows}
+    
+    histograms = {}
+    latency_rows = db.session.query(
+        LatencyRollup.bucket_start, LatencyRollup.latency_bucket, db.func.sum(LatencyRollup.count)
+    ).filter(
+        LatencyRollup.tenant_id.in_(tenant_ids), LatencyRollup.period == period, LatencyRollup.bucket_start >= start
+    ).group_by(LatencyRollup.bucket_start, LatencyRollup.latency_bucket)
+    for row_start, index, count in latency_rows:
+        histograms.setdefault(row_start, {})[index] = count
+    
+    series = []
+    totals = [0, 0, 0, 0, 0]
+    merged_histogram = {}
+    for moment in bucket_series(start, end, period):
+        messages, cache_hits, fallbacks, tokens, latency_total = counters.get(moment, (0, 0, 0, 0, 0))
+        histogram = histograms.get(moment, {})
+        for index, count in histogram.items():
+            merged_histogram[index] = merged_histogram.get(index, 0) + count
+        totals = [total + (value or 0) for total, value in zip(totals, (messages, cache_hits, fallbacks, tokens, latency_total))]
+        series.append({
+            'bucket': moment.isoformat(),
+            'messages': messages,
+            'cache_hit_rate': percent(cache_hits, messages),
+            'fallback_rate': percent(fallbacks, messages),
+            'p50_latency_ms': histogram_percentile(histogram, 50),
+            'p95_latency_ms': histogram_percentile(histogram, 95),
+        })
+    
+    # Messages per hour of day, from hourly rollups (kept for ANALYTICS_HOURLY_RETENTION_DAYS)
+    hours = [0] * 24
+    hourly_rows = db.session.query(ChatRollup.bucket_start, db.func.sum(ChatRollup.message_count)).filter(
+        ChatRollup.tenant_id.in_(tenant_ids), ChatRollup.period == 'hour', ChatRollup.bucket_start >= start
+    ).group_by(ChatRollup.bucket_start)
+    for row_start, messages in hourly_rows:
+        hours[row_start.hour] += messages
+    
+    keyword_hits = db.func.sum(KeywordRollup.hits)
+    top_keywords = db.session.query(KeywordRollup.keyword, keyword_hits).filter(
+        KeywordRollup.tenant_id.in_(tenant_ids), KeywordRollup.bucket_start >= bucket_start(start, 'day')
+    ).group_by(KeywordRollup.keyword).order_by(keyword_hits.desc(), KeywordRollup.keyword).limit(ANALYTICS_TOP_KEYWORDS)
+    
+    messages, cache_hits, fallbacks, tokens, latency_total = totals
+    return {
+        'days': days,
+        'period': period,
+        'summary': {
+            'messages': messages,
+            'tokens': tokens,
+            'cache_hit_rate': percent(cache_hits, messages),
+            'fallback_rate': percent(fallbacks, messages),
+            'avg_latency_ms': round(latency_total / messages) if messages else None,
+            'p50_latency_ms': histogram_percentile(merged_histogram, 50),
+            'p95_latency_ms': histogram_percentile(merged_histogram, 95),
+        },
+        'series': series,
+        'hours': hours,
+        'top_keywords': [{'keyword': keyword, 'hits': hits} for keyword, hits in top_keywords],
+    }
+
+def compact_analytics(rebuild_days=None, now=None):
+    """Drop hourly rollups past retention and optionally rebuild recent rollups from chat logs.
+
+    Rebuilding recomputes every bucket since the start of the day
+    ``rebuild_days`` ago from ChatMessage; run it while the write-behind
+    logger is idle, otherwise turns flushed meanwhile are counted twice.
+    """
+    now = now or datetime.utcnow()
+    hourly_cutoff = bucket_start(now, 'day') - timedelta(days=ANALYTICS_HOURLY_RETENTION_DAYS)
+    for model in (ChatRollup, LatencyRollup):
+        model.query.filter(model.period == 'hour', model.bucket_start < hourly_cutoff).delete(synchronize_session=False)
+    
+    rebuilt = 0
+    if rebuild_days:
+        cutoff = bucket_start(now, 'day') - timedelta(days=rebuild_days)
+        for model in (ChatRollup, LatencyRollup, KeywordRollup):
+            model.query.filter(model.bucket_start >= cutoff).delete(synchronize_session=False)
+        
+        batch = []
+        rows = db.session.query(
+            ChatMessage.user_id, ChatMessage.created_at, ChatMessage.latency_ms, ChatMessage.cache_hit,
+            ChatMessage.fallback, ChatMessage.tokens, ChatMessage.keywords
+        ).filter(ChatMessage.created_at >= cutoff).execution_options(yield_per=5000)
+        for row in rows:
+            batch.append({
+                "tenant_id": row.user_id or DEMO_TENANT,
+                "created_at": row.created_at,
+                "latency_ms": row.latency_ms,
+                "cache_hit": row.cache_hit,
+                "fallback": row.fallback,
+                "tokens": row.tokens,
+                "keywords": row.keywords.split(',') if row.keywords else [],
+            })
+            if len(batch) >= 5000:
+                write_rollups(batch)
+                rebuilt += len(batch)
+                batch = []
+        write_rollups(batch)
+        rebuilt += len(batch)
+    db.session.commit()
+    return rebuilt
+
+@app.cli.command("compact-analytics")
+@click.option("--rebuild-days", type=int, default=None, help="Recompute rollups of the last N days from chat logs")
+def compact_analytics_command(rebuild_days):
+    """Prune old hourly rollups (run periodically, e.g. daily from cron)"""
+    rebuilt = compact_analytics(rebuild_days)
+    print(f"Analytics compacted, {rebuilt} chat turns rolled up again.")
+
+# ---------------- METERING ---------------- #
+# Hız sınırı ve günlük kota bellekte kontrol edilir; sayaçlar sohbet kayıtlarıyla birlikte DB'ye yazılır
+DEMO_RATE_PER_MINUTE = float(os.getenv("DEMO_RATE_PER_MINUTE", 10))
+DEMO_RATE_BURST = int(os.getenv("DEMO_RATE_BURST", 5))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", 30))
+USER_RATE_BURST = int(os.getenv("USER_RATE_BURST", 10))
+USER_DAILY_REQUESTS = int(os.getenv("USER_DAILY_REQUESTS", 500))
+USER_DAILY_TOKENS = int(os.getenv("USER_DAILY_TOKENS", 200000))
+USER_LIMITS_TTL = 60
+
+_demo_rate = RateLimiter(DEMO_RATE_PER_MINUTE / 60, DEMO_RATE_BURST)
+_user_rate = RateLimiter(USER_RATE_PER_MINUTE / 60, USER_RATE_BURST)
+_user_limits = LRUCache(max_items=4096, ttl=USER_LIMITS_TTL)
+
+def load_usage(user_id, day):
+    row = db.session.query(UsageCounter.requests, UsageCounter.tokens).filter_by(user_id=user_id, day=day).first()
+    return (row.requests, row.tokens) if row else (0, 0)
+
+_usage = UsageMeter(load_usage, refresh_seconds=USER_LIMITS_TTL)
+
+def usage_increments(turns):
+    """Aggregate metered chat turns into UsageCounter increments"""
+    counters = {}
+    for turn in turns:
+        if not turn["metered"]:
+            continue
+        key = (turn["user_id"], turn["created_at"].date())
+        row = counters.setdefault(key, {"user_id": key[0], "day": key[1], "requests": 0, "tokens": 0})
+        row["requests"] += 1
+        row["tokens"] += turn["tokens"]
+    return list(counters.values())
+
+def is_unlimited_user(user_id):
+    """User.is_unlimited, cached for USER_LIMITS_TTL seconds"""
+    unlimited = _user_limits.get(user_id)
+    if unlimited is None:
+        unlimited = bool(db.session.query(User.is_unlimited).filter_by(id=user_id).scalar())
+        _user_limits.set(user_id, unlimited)
+    return unlimited
+
+def rate_limited_response(message, retry_after):
+    response = jsonify({"error": message, "retry_after": round(retry_after, 1)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, round(retry_after)))
+    return response
+
+def check_demo_limits():
+    """Per-IP token bucket for the public demo chat; returns a 429 response or None"""
+    retry_after = _demo_rate.allow(request.remote_addr)
+    if retry_after:
+        return rate_limited_response("Çok fazla istek gönderdiniz, lütfen biraz bekleyin.", retry_after)
+    return None
+
+def check_user_limits(user_id, meta):
+    """Rate limit and daily quota for a signed-in user; returns a 429 response or None.
+
+    Unlimited users skip both and are not metered; for everyone else
+    ``meta["metered"]`` is set so the turn is counted when it is logged.
+    """
+    if is_unlimited_user(user_id):
+        return None
+    retry_after = _user_rate.allow(user_id)
+    if retry_after:
+        return rate_limited_response("Çok fazla istek gönderdiniz, lütfen biraz bekleyin.", retry_after)
+    requests_used, tokens_used = _usage.usage(user_id, datetime.utcnow().date())
+    if requests_used >= USER_DAILY_REQUESTS or tokens_used >= USER_DAILY_TOKENS:
+        tomorrow = datetime.combine(datetime.utcnow().date() + timedelta(days=1), datetime.min.time())
+        return rate_limited_response("Günlük kullanım limitiniz doldu.", (tomorrow - datetime.utcnow()).total_seconds())
+    meta["metered"] = True
+    return None
+
+# ---------------- STREAMING ---------------- #
+def wants_stream(data):
+    """Chat endpoints stream when asked via {"stream": true} or an SSE Accept header"""
+    return bool(data.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+
+def sse_event(payload, event=None):
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def stream_reply(chunks, on_complete=None, done_fields=None):
+    """Send reply chunks as Server-Sent Events, ending with a 'done' event holding the full text.
+
+    The generator runs after the request context is torn down, so the DB
+    session is already released while the worker waits on upstream tokens.
+    ``done_fields`` are added to the 'done' payload and ``on_complete(reply)``
+    is called once the stream ends, with the reply sent so far if it was cut short.
+    """
+    route = request_route()
+    
+    def generate():
+        parts = []
+        try:
+            try:
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield sse_event({"delta": chunk})
+            except Exception as e:
+                record_route_error(e, route)
+                yield sse_event({"error": "Yanıt akışı sırasında hata oluştu"}, event="error")
+                return
+            yield sse_event(dict(done_fields or {}, reply="".join(parts)), event="done")
+        finally:
+            # Also when the client disconnects or the stream fails midway: the upstream tokens
+            # are spent, so the (partial) turn is still logged and metered
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            if on_complete:
+                on_complete("".join(parts))
+    
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------------- ROUTES ---------------- #
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -132,6 +1253,7 @@ def register():
             return redirect(url_for("dashboard"))
         except Exception as e:
             db.session.rollback()
+            record_route_error(e)
             flash(f"Kayıt sırasında bir hata oluştu: {str(e)}", "error")
             return redirect(url_for("register"))
 
@@ -165,6 +1287,7 @@ def login():
                 flash("Hatalı e-posta veya şifre!", "error")
                 return redirect(url_for("login"))
         except Exception as e:
+            record_route_error(e)
             flash(f"Giriş sırasında bir hata oluştu: {str(e)}", "error")
             return redirect(url_for("login"))
 
@@ -181,30 +1304,17 @@ def dashboard():
     
     # Dashboard istatistikleri topla
     bot_settings = BotSettings.query.filter_by(user_id=user_id).first()
-    saved_texts_count = SavedBotText.query.filter_by(user_id=user_id).count()
-    recent_texts = SavedBotText.query.filter_by(user_id=user_id).order_by(SavedBotText.created_at.desc()).limit(5).all()
+    recent_texts = db.session.query(
+        SavedBotText.id, SavedBotText.title, SavedBotText.keywords, SavedBotText.created_at,
+        db.func.substr(SavedBotText.content, 1, 81).label('snippet')
+    ).filter_by(user_id=user_id).order_by(SavedBotText.created_at.desc()).limit(5).all()
     
     # Bot konfigürasyon durumu
     has_purpose = bool(bot_settings and bot_settings.bot_purpose)
     has_info = bool(bot_settings and bot_settings.bot_title and bot_settings.bot_info_text)
     
-    # Test verileri kaldırıldı - sadece gerçek veriler gösterilecek
-    
-    # Haftalık metin ekleme grafiği için veri (son 7 gün)
-    from datetime import datetime, timedelta
-    today = datetime.now()
-    week_data = []
-    
-    # Haftalık gerçek veri - test verileri kaldırıldı
-    for i in range(7):
-        date = today - timedelta(days=6-i)
-        day_count = SavedBotText.query.filter_by(user_id=user_id).filter(
-            db.func.date(SavedBotText.created_at) == date.date()
-        ).count()
-        week_data.append({
-            'date': date.strftime('%d.%m'),
-            'count': day_count
-        })
+    # Metin sayısı ve haftalık grafik verisi (son 7 gün)
+    saved_texts_count, week_data = load_text_stats(user_id, datetime.now())
     
     dashboard_stats = {
         'bot_settings_count': 1 if (bot_settings or saved_texts_count == 0) else 0,
@@ -228,9 +1338,24 @@ def api_chat():
         
         if not user_message:
             return jsonify({"error": "Mesaj boş olamaz"}), 400
+        
+        limited = check_demo_limits()
+        if limited:
+            return limited
             
+        started = time.perf_counter()
+        conversation_key = get_conversation_key("demo")
+        meta = {}
+        
+        if wants_stream(data):
+            return stream_reply(
+                stream_sahilkamp_bot(user_message, meta=meta),
+                on_complete=lambda reply: log_chat_turn(conversation_key, None, user_message, reply, started, meta)
+            )
+        
         # Get AI response
-        ai_response = chat_with_sahilkamp_bot(user_message)
+        ai_response = chat_with_sahilkamp_bot(user_message, meta=meta)
+        log_chat_turn(conversation_key, None, user_message, ai_response, started, meta)
         
         return jsonify({
             "response": ai_response,
@@ -238,6 +1363,7 @@ def api_chat():
         })
         
     except Exception as e:
+        record_route_error(e)
         return jsonify({"error": "Sistem hatası"}), 500
 
 @app.route("/logout")
@@ -252,7 +1378,60 @@ def conversations():
     user = session.get("user")
     if not user:
         return redirect(url_for("login"))
-    return render_template("conversations.html", user=user)
+    
+    status = request.args.get("status")
+    rows, next_cursor = load_conversation_page(user, request.args.get("cursor"), status)
+    now = datetime.utcnow()
+    active_since = now - timedelta(minutes=CONVERSATION_ACTIVE_MINUTES)
+    conversation_list = [{
+        'id': row.id,
+        'channel': row.channel,
+        'label': CONVERSATION_LABELS.get(row.channel, "Bot test") + f" #{row.id}",
+        'first_message': row.first_message,
+        'message_count': row.message_count,
+        'ago': time_ago(row.last_message_at, now),
+        'active': row.last_message_at >= active_since,
+    } for row in rows]
+    
+    return render_template("conversations.html", user=user,
+                           conversations=conversation_list,
+                           conversation_stats=load_conversation_stats(user),
+                           next_cursor=next_cursor,
+                           status=status or '')
+
+@app.route("/api/conversations/<int:conversation_id>/messages")
+def conversation_messages(conversation_id):
+    """Messages of one conversation in order, paginated by message id"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    conversation = Conversation.query.filter(Conversation.id == conversation_id, conversation_filter(user)).first()
+    if not conversation:
+        return jsonify({"error": "Konuşma bulunamadı"}), 404
+    
+    after_id = request.args.get("after", 0, type=int)
+    rows = ChatMessage.query.filter(
+        ChatMessage.conversation_id == conversation_id, ChatMessage.id > after_id
+    ).order_by(ChatMessage.id).limit(CONVERSATION_MESSAGES_PAGE_SIZE + 1).all()
+    
+    has_more = len(rows) > CONVERSATION_MESSAGES_PAGE_SIZE
+    rows = rows[:CONVERSATION_MESSAGES_PAGE_SIZE]
+    return jsonify({
+        "messages": [{
+            "id": row.id,
+            "user_message": row.user_message,
+            "bot_reply": row.bot_reply,
+            "latency_ms": row.latency_ms,
+            "cache_hit": row.cache_hit,
+            "fallback": row.fallback,
+            "tokens": row.tokens,
+            "created_at": row.created_at.isoformat(),
+        } for row in rows],
+        "next_after": rows[-1].id if has_more else None,
+    })
+
+BOT_SETTINGS_TABS = ("purpose", "info", "saved", "upload", "intents", "chat")
 
 @app.route("/bot-settings", methods=["GET", "POST"])
 def bot_settings():
@@ -277,7 +1456,9 @@ def bot_settings():
                     bot_settings.user_id = user_id
                     bot_settings.bot_purpose = purpose
                     db.session.add(bot_settings)
+                bump_knowledge_version(user_id)
                 db.session.commit()
+                invalidate_bot_context(user_id)
                 flash("Bot amacı başarıyla kaydedildi!", "success")
         
         # Sekme 2: Bot Bilgileri Kaydetme  
@@ -296,7 +1477,9 @@ def bot_settings():
                     bot_settings.bot_title = bot_title
                     bot_settings.bot_info_text = bot_info
                     db.session.add(bot_settings)
+                bump_knowledge_version(user_id)
                 db.session.commit()
+                invalidate_bot_context(user_id)
                 flash("Bot bilgileri başarıyla kaydedildi!", "success")
         
         # Sekme 3: Yeni Metin Kaydetme
@@ -311,7 +1494,11 @@ def bot_settings():
                 saved_text.content = text_content
                 saved_text.keywords = keywords
                 db.session.add(saved_text)
+                db.session.flush()
+                index_saved_text(saved_text)
+                bump_knowledge_version(user_id, texts=True)
                 db.session.commit()
+                invalidate_bot_context(user_id, texts=True)
                 flash("Metin başarıyla kaydedildi!", "success")
         
         # Sekme 4: Dosya Yükleme  
@@ -324,38 +1511,167 @@ def bot_settings():
                 file_keywords = request.form.get("file_keywords")
                 
                 if file and file.filename != '' and allowed_file(file.filename) and file_title:
+                    path = None
                     try:
-                        # Read file content
-                        file_content = file.read().decode('utf-8')
+                        # Spool the upload to disk in chunks instead of reading it into memory
+                        fd, path = tempfile.mkstemp(suffix='.txt')
+                        with os.fdopen(fd, 'wb') as spool:
+                            shutil.copyfileobj(file.stream, spool, READ_CHUNK_BYTES)
+                            size_bytes = spool.tell()
                         
-                        # Save to database
-                        saved_text = SavedBotText()
-                        saved_text.user_id = user_id
-                        saved_text.title = file_title
-                        saved_text.content = file_content
-                        saved_text.keywords = file_keywords
-                        db.session.add(saved_text)
+                        job = UploadJob()
+                        job.user_id = user_id
+                        job.filename = secure_filename(file.filename) or 'upload.txt'
+                        job.title = file_title
+                        job.keywords = file_keywords
+                        job.size_bytes = size_bytes
+                        db.session.add(job)
                         db.session.commit()
                         
-                        flash(f"'{file.filename}' dosyası başarıyla yüklendi ve kayıt altına alındı!", "success")
-                    except UnicodeDecodeError:
-                        flash("Dosya UTF-8 formatında değil. Lütfen farklı bir dosya deneyin.", "error")
+                        # Large files are chunked in the background, small ones right away
+                        if size_bytes > UPLOAD_BACKGROUND_BYTES:
+                            _upload_executor.submit(run_upload_job, job.id, path, request_route())
+                            path = None  # the background job removes it
+                            flash(f"'{file.filename}' dosyası alındı, arka planda işleniyor.", "info")
+                        else:
+                            job = ingest_upload(job.id, path)
+                            if job.status == 'done':
+                                flash(f"'{file.filename}' dosyası başarıyla yüklendi ve kayıt altına alındı!", "success")
+                            else:
+                                flash(job.error, "error")
                     except Exception as e:
+                        db.session.rollback()
+                        record_route_error(e)
                         flash("Dosya yüklenirken bir hata oluştu.", "error")
+                        if path and os.path.exists(path):
+                            os.remove(path)
                 else:
                     flash("Geçerli bir .txt dosyası ve başlık girmelisiniz!", "error")
         
+        # Sekme 5: Yedek yanıtlar (niyet -> hazır yanıt)
+        elif tab == "intents":
+            intents = parse_intents(request.form.get("intents_text", ""))
+            default_reply = request.form.get("default_reply", "").strip() or None
+            bot_intents = db.session.get(BotIntents, user_id)
+            if bot_intents is None:
+                bot_intents = BotIntents()
+                bot_intents.user_id = user_id
+                db.session.add(bot_intents)
+            bot_intents.intents = json.dumps(intents, ensure_ascii=False)
+            bot_intents.default_reply = default_reply
+            bump_knowledge_version(user_id)
+            db.session.commit()
+            invalidate_bot_context(user_id)
+            flash(f"{len(intents)} yedek yanıt kaydedildi!", "success")
+            return redirect(url_for("bot_settings", tab="intents"))
+        
         return redirect(url_for("bot_settings"))
     
-    # Mevcut verileri getir
+    # Mevcut verileri getir (metinler sayfa sayfa, içerik yerine kısa özet ile)
     user_id = user["id"]
     bot_settings = BotSettings.query.filter_by(user_id=user_id).first()
-    saved_texts = SavedBotText.query.filter_by(user_id=user_id).order_by(SavedBotText.created_at.desc()).all()
+    saved_texts, next_cursor = load_saved_text_page(user_id, request.args.get("after"))
+    saved_texts_count, _ = load_text_stats(user_id, datetime.now())
+    bot_intents = db.session.get(BotIntents, user_id)
+    
+    active_tab = request.args.get("tab")
+    if active_tab not in BOT_SETTINGS_TABS:
+        active_tab = "saved" if request.args.get("after") else "purpose"
     
     return render_template("bot_settings.html", 
                          user=user, 
                          bot_settings=bot_settings,
-                         saved_texts=saved_texts)
+                         saved_texts=saved_texts,
+                         saved_texts_count=saved_texts_count,
+                         next_cursor=next_cursor,
+                         intents_text=format_intents(json.loads(bot_intents.intents)) if bot_intents else "",
+                         default_reply=bot_intents.default_reply if bot_intents and bot_intents.default_reply else "",
+                         active_tab=active_tab)
+
+@app.route("/api/saved-texts/<int:text_id>")
+def saved_text_detail(text_id):
+    """Full content of one saved text, fetched on demand from the bot_settings list"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    saved_text = SavedBotText.query.filter_by(id=text_id, user_id=user["id"]).first()
+    if not saved_text:
+        return jsonify({"error": "Metin bulunamadı"}), 404
+    
+    # Uploaded files are stored as passages, rebuild the text from them
+    content = saved_text.content
+    if UploadJob.query.filter_by(text_id=text_id).first():
+        passages = db.session.query(TextPassage.content).filter_by(user_id=user["id"], text_id=text_id).order_by(TextPassage.position)
+        content = "\n\n".join(passage for (passage,) in passages)
+    
+    return jsonify({
+        "id": saved_text.id,
+        "title": saved_text.title,
+        "content": content,
+        "keywords": saved_text.keywords,
+        "created_at": saved_text.created_at.isoformat() if saved_text.created_at else None
+    })
+
+@app.route("/api/saved-texts/import", methods=["POST"])
+def import_saved_texts_api():
+    """Bulk import saved texts from a JSONL or CSV file (title, content, keywords).
+
+    Changes the bot's knowledge, so it is CSRF protected: send the token in
+    the X-CSRFToken header (or a csrf_token form field with multipart uploads).
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename or "") if upload else ""
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "csv" if filename.lower().endswith(".csv") or "csv" in (request.content_type or "") else "jsonl"
+    if fmt not in ("jsonl", "csv"):
+        return jsonify({"error": "Desteklenen formatlar: jsonl, csv"}), 400
+    
+    started = time.perf_counter()
+    try:
+        imported, errors = import_saved_texts(user["id"], stream, fmt)
+    except UnicodeDecodeError:
+        return jsonify({"error": "Dosya UTF-8 formatında değil."}), 400
+    except csv.Error:
+        return jsonify({"error": "CSV dosyası okunamadı."}), 400
+    except Exception as e:
+        record_route_error(e)
+        return jsonify({"error": "İçe aktarma sırasında bir hata oluştu."}), 500
+    
+    return jsonify({
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3)
+    })
+
+@app.route("/api/upload-jobs/<int:job_id>")
+def upload_job_status(job_id):
+    """Progress of a .txt upload that is being chunked in the background"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    fail_stale_upload_jobs(user["id"])
+    job = UploadJob.query.filter_by(id=job_id, user_id=user["id"]).first()
+    if not job:
+        return jsonify({"error": "İş bulunamadı"}), 404
+    
+    return jsonify({
+        "id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "size_bytes": job.size_bytes,
+        "passage_count": job.passage_count,
+        "text_id": job.text_id,
+        "error": job.error
+    })
 
 @app.route("/users")
 def users():
@@ -371,6 +1687,34 @@ def analytics():
         return redirect(url_for("login"))
     return render_template("analytics.html", user=user)
 
+@app.route("/api/usage")
+def usage_data():
+    """Today's metered usage and limits of the signed-in user"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    if is_unlimited_user(user["id"]):
+        return jsonify({"unlimited": True})
+    requests_used, tokens_used = _usage.usage(user["id"], datetime.utcnow().date())
+    return jsonify({
+        "unlimited": False,
+        "requests": requests_used,
+        "tokens": tokens_used,
+        "daily_requests_limit": USER_DAILY_REQUESTS,
+        "daily_tokens_limit": USER_DAILY_TOKENS,
+    })
+
+@app.route("/api/analytics")
+def analytics_data():
+    """Chart data for the analytics page, read from the precomputed rollups"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    days = min(max(request.args.get("days", 7, type=int), 1), ANALYTICS_MAX_DAYS)
+    return jsonify(load_analytics(analytics_tenants(user), days))
+
 @app.route("/billing")
 def billing():
     user = session.get("user")
@@ -378,6 +1722,56 @@ def billing():
         return redirect(url_for("login"))
     return render_template("billing.html", user=user)
 
+def build_bot_prompt(user_id, user_message, meta=None, bot_context=None, budget_tokens=None):
+    """Build the bot_chat system prompt from the tenant's settings and best matching passages.
+
+    Settings and passages are packed into ``budget_tokens`` (PROMPT_CONTEXT_TOKENS
+    by default), most relevant first. The matched keywords and the packed
+    context size are reported in ``meta`` for analytics and the response.
+    """
+    # Compiled settings, keywords and indexes (rebuilt only after edits)
+    bot_context = bot_context or get_bot_context(user_id)
+    return build_bot_prompts(bot_context, [user_message], [meta], budget_tokens)[0]
+
+def build_bot_prompts(bot_context, messages, metas, budget_tokens=None):
+    """build_bot_prompt for many messages of one tenant, with retrieval batched across them"""
+    passage_lists = retrieve_passages(bot_context, messages, metas)
+    
+    # If no specific context found, add saved texts as general knowledge
+    general = None
+    prompts = []
+    for message, meta, passages in zip(messages, metas, passage_lists):
+        if not passages and not bot_context.preamble:
+            if general is None:
+                general = (TextPassage.query.filter_by(user_id=bot_context.user_id, position=0)
+                           .filter(TextPassage.text_id.not_in(processing_upload_text_ids()))
+                           .order_by(TextPassage.text_id).limit(3).all())  # Limit to first 3
+            passages = general
+        prompts.append(pack_bot_prompt(bot_context, message, passages, meta, budget_tokens))
+    return prompts
+
+def pack_bot_prompt(bot_context, user_message, passages, meta=None, budget_tokens=None):
+    """Pack the tenant's settings and retrieved passages into the system prompt"""
+    # Pack by relevance: first setting (bot purpose), ranked passages, then the
+    # remaining (often long) info text; the prompt still lists settings first
+    snippets = [f"{bot_context.titles[passage.text_id]}: {passage.content}" for passage in passages]
+    head, tail = bot_context.preamble[:1], bot_context.preamble[1:]
+    packed, stats = pack_context(head + snippets + tail, budget_tokens or PROMPT_CONTEXT_TOKENS)
+    packed_snippets = packed[len(head):len(head) + len(snippets)]
+    packed_settings = packed[:len(head)] + packed[len(head) + len(snippets):]
+    context = [text for text in packed_settings + packed_snippets if text]
+    
+    # Create prompt for the bot
+    system_prompt = f"""Sen bir yardımcı bot'sun. Kullanıcının aşağıdaki bilgilerine göre sorularını yanıtla:
+
+{chr(10).join(context) if context else "Henüz özel bilgi girilmemiş."}
+
+Kısa, yararlı ve dostça yanıtlar ver. Türkçe yanıt ver."""
+    if meta is not None:
+        meta["context"] = dict(stats, prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_message))
+        meta["passages"] = [[passage.text_id, passage.position] for passage in passages]
+    return system_prompt
+
 @app.route("/api/bot-chat", methods=["POST"])
 @csrf.exempt
 def bot_chat():
@@ -392,70 +1786,334 @@ def bot_chat():
         if not user_message:
             return jsonify({"error": "Mesaj boş olamaz"}), 400
         
-        user_id = user["id"]
+        meta = {}
+        limited = check_user_limits(user["id"], meta)
+        if limited:
+            return limited
         
-        # Get user's bot settings and saved texts
-        bot_settings = BotSettings.query.filter_by(user_id=user_id).first()
-        saved_texts = SavedBotText.query.filter_by(user_id=user_id).all()
+        started = time.perf_counter()
+        conversation_key = get_conversation_key("bot")
+        bot_context = get_bot_context(user["id"])
+        system_prompt = build_bot_prompt(user["id"], user_message, meta, bot_context)
         
-        # Create context for the bot
-        context = []
+        if wants_stream(data):
+            return stream_reply(
+                stream_sahilkamp_bot(user_message, system_prompt, tenant=user["id"], meta=meta,
+                                     fallback_router=bot_context.fallback_router),
+                on_complete=lambda reply: log_chat_turn(conversation_key, user["id"], user_message, reply, started, meta),
+                done_fields={"context": meta["context"]}
+            )
         
-        if bot_settings:
-            if bot_settings.bot_purpose:
-                context.append(f"Bot Amacı: {bot_settings.bot_purpose}")
-            if bot_settings.bot_title and bot_settings.bot_info_text:
-                context.append(f"{bot_settings.bot_title}: {bot_settings.bot_info_text}")
-        
-        # Add saved texts that might be relevant
-        for text in saved_texts:
-            if text.keywords:
-                keywords = [k.strip().lower() for k in text.keywords.split(',')]
-                if any(keyword in user_message.lower() for keyword in keywords):
-                    context.append(f"{text.title}: {text.content}")
+        # Use OpenAI service to get response
+        bot_response = chat_with_sahilkamp_bot(user_message, system_prompt, tenant=user["id"], meta=meta,
+                                               fallback_router=bot_context.fallback_router)
+        log_chat_turn(conversation_key, user["id"], user_message, bot_response, started, meta)
         
-        # If no specific context found, add all saved texts as general knowledge
-        if not context and saved_texts:
-            context = [f"{text.title}: {text.content}" for text in saved_texts[:3]]  # Limit to first 3
+        return jsonify({"reply": bot_response, "context": meta["context"]})
         
-        # Create prompt for the bot
-        system_prompt = f"""Sen bir yardımcı bot'sun. Kullanıcının aşağıdaki bilgilerine göre sorularını yanıtla:
+    except Exception as e:
+        record_route_error(e)
+        return jsonify({"error": "Bot yanıt verirken hata oluştu. Lütfen tekrar deneyin."}), 500
 
-{chr(10).join(context) if context else "Henüz özel bilgi girilmemiş."}
+# ---------------- BATCH EVALUATION ---------------- #
+# Bir tenant'ın botunu çok sayıda örnek soruyla test etmek için: bağlam ve prompt'lar bir kez,
+# toplu retrieval ile kurulur; upstream çağrıları sınırlı bir pencereyle paralel gider.
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 500))
+# Per batch; below LLM_MAX_IN_FLIGHT_PER_TENANT so a running batch leaves the tenant's live chat a slot
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 3))
+_batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BATCH_WORKERS", 8)), thread_name_prefix="batch")
 
-Kısa, yararlı ve dostça yanıtlar ver. Türkçe yanıt ver."""
-        
-        # Use OpenAI service to get response
-        bot_response = chat_with_sahilkamp_bot(user_message, system_prompt)
-        
-        return jsonify({"reply": bot_response})
-        
+def run_bot_batch(user_id, questions, concurrency=BATCH_CONCURRENCY, conversation_key=None, metered=False, route='cli'):
+    """Answer many questions with a tenant's bot; return a generator of results in completion order.
+
+    The tenant context and every prompt are built right away, in the
+    caller's app context, so the generator itself needs no database. It keeps
+    at most ``concurrency`` questions at the upstream and cancels the rest
+    when closed. One dict is yielded per question, then a summary with
+    ``done: true``. With ``conversation_key`` the turns are logged (and
+    metered if ``metered``) like bot_chat turns, in one conversation.
+    """
+    bot_context = get_bot_context(user_id)
+    metas = [{"metered": True} if metered else {} for _ in questions]
+    prompts = build_bot_prompts(bot_context, questions, metas)
+    
+    def answer(index):
+        started = time.perf_counter()
+        question, meta = questions[index], metas[index]
+        reply = chat_with_sahilkamp_bot(question, prompts[index], tenant=user_id, meta=meta,
+                                        fallback_router=bot_context.fallback_router)
+        if conversation_key:
+            log_chat_turn(conversation_key, user_id, question, reply, started, meta)
+        return {
+            "index": index,
+            "question": question,
+            "reply": reply,
+            "keywords": meta["keywords"],
+            "passages": meta["passages"],
+            "context": meta["context"],
+            "cache_hit": meta["cache_hit"],
+            "fallback": meta["fallback"],
+            "tokens": meta["tokens"],
+            "latency_ms": int((time.perf_counter() - started) * 1000),
+        }
+    
+    def results():
+        started = time.perf_counter()
+        summary = {"done": True, "questions": len(questions), "errors": 0, "fallbacks": 0, "cache_hits": 0, "tokens": 0}
+        pending = {}
+        next_index = 0
+        try:
+            while next_index < len(questions) or pending:
+                while next_index < len(questions) and len(pending) < concurrency:
+                    pending[_batch_executor.submit(answer, next_index)] = next_index
+                    next_index += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=pending.get):
+                    index = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        record_route_error(e, route)
+                        summary["errors"] += 1
+                        yield {"index": index, "question": questions[index], "error": "Bot yanıt verirken hata oluştu"}
+                        continue
+                    summary["fallbacks"] += int(result["fallback"])
+                    summary["cache_hits"] += int(result["cache_hit"])
+                    summary["tokens"] += result["tokens"]
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+        summary["elapsed_ms"] = int((time.perf_counter() - started) * 1000)
+        yield summary
+    
+    return results()
+
+@app.route("/api/bot-chat/batch", methods=["POST"])
+@csrf.exempt
+def bot_chat_batch():
+    """Answer a list of test questions with the user's bot, streamed as NDJSON (one line per answer, then a summary)"""
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Oturum açmanız gerekli"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "Soru listesi boş olamaz"}), 400
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({"error": "Her soru boş olmayan bir metin olmalı"}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"Tek seferde en fazla {BATCH_MAX_QUESTIONS} soru gönderilebilir"}), 400
+    questions = [question.strip() for question in questions]
+    concurrency = data.get("concurrency", BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool):
+        return jsonify({"error": "concurrency bir sayı olmalı"}), 400
+    concurrency = min(max(concurrency, 1), BATCH_CONCURRENCY)
+    
+    meta = {}
+    limited = check_user_limits(user["id"], meta)
+    if limited:
+        return limited
+    if meta.get("metered"):
+        requests_used, _ = _usage.usage(user["id"], datetime.utcnow().date())
+        remaining = max(USER_DAILY_REQUESTS - requests_used, 0)
+        if len(questions) > remaining:
+            return jsonify({"error": "Günlük kullanım limitiniz bu kadar soru için yeterli değil.", "remaining": remaining}), 429
+    
+    try:
+        results = run_bot_batch(user["id"], questions, concurrency, conversation_key=f"eval:{uuid.uuid4().hex}",
+                                metered=bool(meta.get("metered")), route=request_route())
     except Exception as e:
+        record_route_error(e)
         return jsonify({"error": "Bot yanıt verirken hata oluştu. Lütfen tekrar deneyin."}), 500
+    
+    # Generated after the request context is gone; run_bot_batch already did the DB work
+    return Response((json.dumps(result, ensure_ascii=False) + "\n" for result in results),
+                    mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def compare_batch_results(results, baseline):
+    """Compare two runs' answers by question; return regressions and changed replies"""
+    previous = {row["question"]: row for row in baseline if "question" in row}
+    compared, changed_replies, regressions = 0, [], []
+    for row in results:
+        before = previous.get(row["question"])
+        if before is None:
+            continue
+        compared += 1
+        if "error" in row and "error" not in before:
+            regressions.append((row["question"], "error"))
+        elif "error" in row or "error" in before:
+            continue
+        elif row["passages"] != before.get("passages"):
+            regressions.append((row["question"], "retrieval changed"))
+        elif row["fallback"] and not before.get("fallback"):
+            regressions.append((row["question"], "fallback reply"))
+        if row.get("reply") != before.get("reply"):
+            changed_replies.append(row["question"])
+    return compared, regressions, changed_replies
+
+@app.cli.command("eval-bot")
+@click.argument("email")
+@click.argument("questions_file", type=click.File("r", encoding="utf-8"))
+@click.option("--concurrency", type=int, default=BATCH_CONCURRENCY, show_default=True, help="Questions at the upstream at once")
+@click.option("--output", type=click.File("w", encoding="utf-8"), default="-", help="NDJSON results (default: stdout)")
+@click.option("--baseline", type=click.File("r", encoding="utf-8"), help="NDJSON output of an earlier run to compare against")
+@click.option("--fail-on-regression", is_flag=True, help="Exit 1 if retrieval changed or a question now errors or falls back")
+def eval_bot_command(email, questions_file, concurrency, output, baseline, fail_on_regression):
+    """Answer every line of QUESTIONS_FILE with the bot of the user EMAIL (offline regression runs).
+
+    Turns are neither logged nor metered.
+    """
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        raise click.UsageError(f"No user with email {email}")
+    questions = [line.strip() for line in questions_file if line.strip()]
+    if not questions:
+        raise click.UsageError("No questions in the file")
+    
+    results = []
+    for result in run_bot_batch(user.id, questions, max(concurrency, 1)):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        if result.get("done"):
+            click.echo(f"{result['questions']} questions in {result['elapsed_ms']} ms: {result['fallbacks']} fallbacks, "
+                       f"{result['cache_hits']} cache hits, {result['errors']} errors, {result['tokens']} tokens", err=True)
+        else:
+            results.append(result)
+    
+    if baseline:
+        compared, regressions, changed_replies = compare_batch_results(results, [json.loads(line) for line in baseline if line.strip()])
+        click.echo(f"Compared {compared} questions with the baseline: {len(regressions)} regressions, "
+                   f"{len(changed_replies)} changed replies", err=True)
+        for question, reason in regressions:
+            click.echo(f"  {reason}: {question}", err=True)
+        if regressions and fail_on_regression:
+            sys.exit(1)
+
+
+# ---------------- METRICS ---------------- #
+# /metrics: Prometheus metin formatı. METRICS_TOKEN verilirse "Authorization: Bearer <token>" gerekir;
+# token yoksa uç nokta yalnızca debug modunda açıktır. Değerler worker (süreç) başınadır.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PROFILE_HZ = int(os.getenv("METRICS_PROFILE_HZ", 100))
+METRICS_PROFILE_MAX_SECONDS = int(os.getenv("METRICS_PROFILE_MAX_SECONDS", 60))
+SQL_STATEMENT_KINDS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'PRAGMA'}
+
+_request_latency = metrics.histogram('http_request_seconds', 'Request duration until the response is fully sent',
+                                     labels=('method', 'route', 'status'))
+_request_queries = metrics.histogram('db_queries_per_request', 'Database queries run while handling a request',
+                                     labels=('route',), buckets=COUNT_BUCKETS)
+_request_query_time = metrics.histogram('db_query_seconds_per_request', 'Time spent in database queries per request',
+                                        labels=('route',))
+_query_latency = metrics.histogram('db_query_seconds', 'Duration of single database queries', labels=('statement',))
+_route_errors = metrics.counter('http_errors_total', 'Exceptions raised while handling requests',
+                                labels=('route', 'error'))
+metrics.gauge('llm_upstream_calls', 'Upstream LLM calls in flight/queued, and shed since start',
+              upstream_stats, label='state')
+metrics.gauge('llm_response_cache', 'LLM response cache counters and size', cache_stats, label='stat')
+metrics.gauge('chat_log_turns', 'Write-behind chat log turns by state', lambda: _chat_log.stats(), label='state')
+metrics.gauge('usage_meter', 'Users and unflushed usage tracked by the usage meter', lambda: _usage.stats(), label='stat')
+metrics.gauge('rate_limited_total', 'Requests rejected by the rate limiters',
+              lambda: {"demo": _demo_rate.limited, "user": _user_rate.limited}, label='limiter', kind='counter')
+metrics.gauge('bot_context_cache_entries', 'Tenants with a cached text index', lambda: len(_text_indexes))
+metrics.gauge('bot_context_cache_passages', 'Passages indexed by the cached text indexes', lambda: _text_indexes.bytes)
+_profiler = SamplingProfiler(hz=METRICS_PROFILE_HZ, max_seconds=METRICS_PROFILE_MAX_SECONDS)
 
+def request_route():
+    """URL rule of the current request, so metric labels stay bounded"""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
 
-@app.route("/pricing")
-def pricing():
-    return render_template("pricing.html")
+def record_route_error(error, route=None):
+    """Log and count an exception a handler turned into an error response (call from the except block)"""
+    route = route or request_route()
+    app.logger.exception("%s failed", route)
+    _route_errors.inc(route=route, error=type(error).__name__)
 
-# ---------------- HEALTH CHECK ---------------- #
-@app.route("/health")
-def health():
-    """Health check endpoint for deployment monitoring"""
-    return jsonify({"status": "ok", "service": "botcuk-platform"}), 200
+@got_request_exception.connect_via(app)
+def record_unhandled_error(sender, exception, **extra):
+    _route_errors.inc(route=request_route(), error=type(exception).__name__)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+    kind = statement.lstrip()[:6].upper()
+    _query_latency.observe(elapsed, statement=kind if kind in SQL_STATEMENT_KINDS else 'OTHER')
+    if has_request_context():
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_query_time = g.get("db_query_time", 0.0) + elapsed
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    route = request_route()
+    labels = {"method": request.method, "route": route, "status": response.status_code}
+    _request_queries.observe(g.get("db_queries", 0), route=route)
+    _request_query_time.observe(g.get("db_query_time", 0.0), route=route)
+    if response.is_streamed:
+        # SSE replies: count the time until the stream is closed, not just the headers
+        response.call_on_close(lambda: _request_latency.observe(time.perf_counter() - started, **labels))
+    else:
+        _request_latency.observe(time.perf_counter() - started, **labels)
+    return response
+
+def metrics_allowed():
+    if METRICS_TOKEN:
+        return request.headers.get("Authorization") == f"Bearer {METRICS_TOKEN}"
+    # Without a token only the local debug server serves them; FLASK_ENV is often unset in deployments
+    return app.debug
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    if not metrics_allowed():
+        return jsonify({"error": "Yetkisiz"}), 403
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/profile")
+def metrics_profile():
+    """Sample all threads for ?seconds=N and return collapsed stacks (flamegraph.pl / speedscope input)"""
+    if not metrics_allowed():
+        return jsonify({"error": "Yetkisiz"}), 403
+    seconds = max(1, min(request.args.get("seconds", 10, type=int), METRICS_PROFILE_MAX_SECONDS))
+    stacks = _profiler.profile(seconds)
+    if stacks is None:
+        return jsonify({"error": "Başka bir profil çalışıyor"}), 409
+    return Response(SamplingProfiler.collapse(stacks), mimetype="text/plain")
 
 # ---------------- ERROR HANDLERS ---------------- #
 @app.errorhandler(CSRFError)
 def handle_csrf_error(e):
+    if request.path.startswith('/api/'):
+        return jsonify({"error": "Güvenlik doğrulaması başarısız (CSRF). Sayfayı yenileyip tekrar deneyin."}), 400
     flash("Security token expired. Please try again.", "error")
     return redirect(request.referrer or url_for('index'))
 
 # Flash messages are automatically available in templates through Flask
 
+@app.cli.command("compile-templates")
+def compile_templates_command():
+    """Fill TEMPLATE_CACHE_DIR with compiled templates (run at build time)"""
+    if not app.jinja_env.bytecode_cache:
+        raise click.UsageError("TEMPLATE_CACHE_DIR is not set")
+    names = compile_templates(app)
+    print(f"Compiled {len(names)} templates.")
+
 # ---------------- RUN ---------------- #
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()  # DB tablolarını oluştur
+        upgrade_database()  # DB şemasını ve bilgi indeksini migrations/ ile güncelle (gunicorn için: flask --app main db upgrade)
+        fail_stale_upload_jobs()  # önceki süreçte yarım kalan yüklemeler
     
     # Production-ready configuration
     debug_mode = os.getenv("FLASK_DEBUG", "False").lower() == "true"
@@ -0,0 +1,128 @@
+"""Multi-keyword matching and intent routing with Turkish-aware case folding."""
+
+from collections import deque
+
+
+def fold_case(text):
+    """Lowercase text with Turkish dotted/dotless I handled correctly"""
+    return text.replace('I', 'ı').replace('İ', 'i').lower().replace('i̇', 'i')
+
+
+def fold_for_matching(text):
+    """Case-fold text for comparisons: like fold_case, but ı and i become the same letter.
+
+    Text typed on a keyboard without Turkish letters spells ı as i ("FIYAT",
+    "kedi var mi"), so both spellings have to match each other.
+    """
+    return fold_case(text).replace('ı', 'i')
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over case-folded keywords.
+
+    ``find`` reports every keyword occurring anywhere in a text, overlapping
+    ones included (same result as ``keyword in text`` for each keyword), in a
+    single pass over the text however many keywords there are.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for keyword in keywords:
+            self._add(keyword)
+        self._link()
+
+    def _add(self, keyword):
+        pattern = fold_for_matching(keyword)
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] += (keyword,)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def find(self, text):
+        """Return the set of keywords (as given) that occur in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in fold_for_matching(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+
+class IntentRouter:
+    """Pick a canned reply by keyword intent.
+
+    ``intents`` is a list of {"keywords": [...], "reply": "..."} dicts in
+    priority order: when several intents match, the earliest one wins.
+    """
+
+    def __init__(self, intents, default_reply):
+        self.intents = intents
+        self.default_reply = default_reply
+        self._priority = {}
+        for index, intent in enumerate(intents):
+            for keyword in intent["keywords"]:
+                self._priority.setdefault(keyword, index)
+        self._matcher = KeywordMatcher(self._priority)
+
+    def match(self, message):
+        """Return the matching intent, or None"""
+        found = self._matcher.find(message)
+        if not found:
+            return None
+        return self.intents[min(self._priority[keyword] for keyword in found)]
+
+    def reply(self, message):
+        intent = self.match(message)
+        return intent["reply"] if intent else self.default_reply
+
+
+def parse_intents(text):
+    """Parse intents written as blocks separated by blank lines.
+
+    The first line of a block lists the comma separated keywords, the
+    remaining lines are the reply. Blocks without keywords or reply are
+    skipped.
+    """
+    intents = []
+    for block in text.replace('\r\n', '\n').split('\n\n'):
+        lines = block.strip().split('\n')
+        keywords = [keyword.strip() for keyword in lines[0].split(',') if keyword.strip()]
+        reply = '\n'.join(lines[1:]).strip()
+        if keywords and reply:
+            intents.append({"keywords": keywords, "reply": reply})
+    return intents
+
+
+def format_intents(intents):
+    """Inverse of parse_intents, for editing"""
+    return '\n\n'.join(', '.join(intent["keywords"]) + '\n' + intent["reply"] for intent in intents)
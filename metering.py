@@ -0,0 +1,107 @@
+"""Rate limiting and usage metering kept in process memory."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token-bucket rate limiter keyed by user id or client IP.
+
+    Each key may spend ``burst`` requests at once, refilled at ``rate`` per
+    second. Only the ``max_keys`` most recently seen keys are tracked; an
+    evicted key starts again with a full bucket, which is what an idle key
+    would have anyway.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1):
+        """Spend ``cost`` tokens; return 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0
+            else:
+                retry_after = (cost - tokens) / self.rate
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+
+class UsageMeter:
+    """Per-user daily request and token counters checked without a DB round trip.
+
+    ``usage`` returns the persisted totals (loaded through ``load_fn`` and
+    refreshed every ``refresh_seconds`` to pick up other workers) plus this
+    process's unflushed increments. The app persists increments itself and
+    reports them back with ``flushed``.
+    """
+
+    def __init__(self, load_fn, refresh_seconds=60):
+        self.load_fn = load_fn  # (user_id, day) -> (requests, tokens)
+        self.refresh_seconds = refresh_seconds
+        self._baseline = {}  # (user_id, day) -> [requests, tokens, loaded_at]
+        self._pending = {}  # (user_id, day) -> [requests, tokens]
+        self._day = None
+        self._lock = threading.Lock()
+
+    def _roll_day(self, day):
+        # Counters of earlier days are no longer checked; keep only unflushed ones
+        if day != self._day:
+            self._day = day
+            self._baseline = {key: value for key, value in self._baseline.items() if key[1] >= day}
+
+    def usage(self, user_id, day):
+        """Return (requests, tokens) used by user_id on day"""
+        key = (user_id, day)
+        with self._lock:
+            self._roll_day(day)
+            baseline = self._baseline.get(key)
+        if baseline is None or time.monotonic() - baseline[2] > self.refresh_seconds:
+            requests, tokens = self.load_fn(user_id, day)
+            with self._lock:
+                baseline = self._baseline[key] = [requests, tokens, time.monotonic()]
+        with self._lock:
+            pending = self._pending.get(key, (0, 0))
+            return baseline[0] + pending[0], baseline[1] + pending[1]
+
+    def record(self, user_id, day, requests=1, tokens=0):
+        with self._lock:
+            pending = self._pending.setdefault((user_id, day), [0, 0])
+            pending[0] += requests
+            pending[1] += tokens
+
+    def flushed(self, user_id, day, requests, tokens):
+        """Move persisted increments from the unflushed counters to the baseline"""
+        key = (user_id, day)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending[0] -= requests
+                pending[1] -= tokens
+                if pending[0] <= 0 and pending[1] <= 0:
+                    del self._pending[key]
+            baseline = self._baseline.get(key)
+            if baseline is not None:
+                baseline[0] += requests
+                baseline[1] += tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._baseline),
+                "pending_requests": sum(pending[0] for pending in self._pending.values()),
+                "pending_tokens": sum(pending[1] for pending in self._pending.values()),
+            }
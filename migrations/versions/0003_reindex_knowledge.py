@@ -0,0 +1,213 @@
+"""reindex knowledge
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 02:10:00.000000
+
+Data migration: rebuilds keyword index rows and passages (with embeddings)
+from saved texts, like `flask --app main reindex`. Texts saved before the
+knowledge index existed have no rows at all, and keywords stored before
+the current case folding need to be folded again. Passages of uploaded
+files are kept (SavedBotText only holds a preview of them) and only
+re-embedded. Uses the migration's connection, not the app's models. The
+keyword parsing, passage splitting and embedding below are copies of the
+knowledge.py helpers as of this revision; this migration must keep
+writing the same rows if those change later.
+
+"""
+from collections import Counter
+import math
+import re
+import zlib
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+PASSAGE_CHARS = 600
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+EMBEDDING_DIM = 512
+CHAR_NGRAM = 3
+CHAR_NGRAM_WEIGHT = 0.5
+
+saved_bot_text = sa.table('saved_bot_text', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                          sa.column('content', sa.Text), sa.column('keywords', sa.String))
+keyword_index = sa.table('keyword_index', sa.column('user_id', sa.Integer), sa.column('keyword', sa.String),
+                         sa.column('text_id', sa.Integer))
+text_passage = sa.table('text_passage', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                        sa.column('text_id', sa.Integer), sa.column('position', sa.Integer),
+                        sa.column('content', sa.Text), sa.column('embedding', sa.LargeBinary))
+upload_job = sa.table('upload_job', sa.column('text_id', sa.Integer))
+knowledge_version = sa.table('knowledge_version', sa.column('version', sa.Integer))
+
+
+def fold_case(text):
+    return text.replace('I', 'ı').replace('İ', 'i').lower().replace('i̇', 'i')
+
+
+def fold_for_matching(text):
+    return fold_case(text).replace('ı', 'i')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold_for_matching(text))
+
+
+def parse_keywords(raw_keywords):
+    if not raw_keywords:
+        return []
+    keywords = []
+    seen = set()
+    for keyword in raw_keywords.split(','):
+        keyword = fold_case(keyword.strip())
+        if keyword and fold_for_matching(keyword) not in seen:
+            seen.add(fold_for_matching(keyword))
+            keywords.append(keyword)
+    return keywords
+
+
+def _hard_split(sentence, max_chars):
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def _paragraph_passages(paragraph, max_chars):
+    paragraph = ' '.join(paragraph.split())
+    if not paragraph:
+        return
+    current = ''
+    for sentence in SENTENCE_RE.split(paragraph):
+        for piece in _hard_split(sentence, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                yield current
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        yield current
+
+
+def iter_passages(chunks, max_chars=PASSAGE_CHARS):
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        paragraphs = PARAGRAPH_RE.split(buffer)
+        buffer = paragraphs.pop()
+        if len(buffer) > 4 * max_chars:
+            cut = buffer.rfind(' ', 0, len(buffer) - max_chars)
+            if cut > 0:
+                paragraphs.append(buffer[:cut])
+                buffer = buffer[cut:]
+        for paragraph in paragraphs:
+            yield from _paragraph_passages(paragraph, max_chars)
+    yield from _paragraph_passages(buffer, max_chars)
+
+
+def split_passages(text, max_chars=PASSAGE_CHARS):
+    return list(iter_passages([text], max_chars))
+
+
+def _token_features(token):
+    features = [token]
+    padded = f" {token} "
+    if len(padded) > CHAR_NGRAM:
+        features += [padded[i:i + CHAR_NGRAM] for i in range(len(padded) - CHAR_NGRAM + 1)]
+    buckets, weights = [], []
+    for n, feature in enumerate(features):
+        digest = zlib.crc32(feature.encode('utf-8'))
+        buckets.append(digest % EMBEDDING_DIM)
+        weight = 1.0 if n == 0 else CHAR_NGRAM_WEIGHT
+        weights.append(weight if digest & 0x80000000 else -weight)
+    return buckets, weights
+
+
+def embed_texts(texts):
+    matrix = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets, values = [], []
+        for token, count in Counter(tokenize(text)).items():
+            token_buckets, token_weights = _token_features(token)
+            buckets += token_buckets
+            if count == 1:
+                values += token_weights
+            else:
+                scale = 1 + math.log(count)
+                values += [weight * scale for weight in token_weights]
+        if buckets:
+            matrix[row] = np.bincount(buckets, weights=values, minlength=EMBEDDING_DIM)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def upgrade():
+    bind = op.get_bind()
+    chunked_ids = {text_id for (text_id,) in bind.execute(
+        sa.select(upload_job.c.text_id).where(upload_job.c.text_id.isnot(None)))}
+    bind.execute(keyword_index.delete())
+    bind.execute(text_passage.delete().where(text_passage.c.text_id.not_in(chunked_ids)))
+
+    # Keyword rows for every text, passages for texts that are stored whole
+    last_id = 0
+    while True:
+        texts = bind.execute(
+            sa.select(saved_bot_text).where(saved_bot_text.c.id > last_id).order_by(saved_bot_text.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not texts:
+            break
+        last_id = texts[-1].id
+        keywords = [{"user_id": text.user_id, "keyword": keyword[:200], "text_id": text.id}
+                    for text in texts for keyword in parse_keywords(text.keywords)]
+        passages = [{"user_id": text.user_id, "text_id": text.id, "position": position, "content": content}
+                    for text in texts if text.id not in chunked_ids
+                    for position, content in enumerate(split_passages(text.content))]
+        if keywords:
+            bind.execute(keyword_index.insert(), keywords)
+        if passages:
+            embeddings = embed_texts([passage["content"] for passage in passages])
+            for row, passage in enumerate(passages):
+                passage["embedding"] = embeddings[row].tobytes()
+            bind.execute(text_passage.insert(), passages)
+
+    # Re-embed the kept passages of uploaded files
+    last_id = 0
+    while chunked_ids:
+        rows = bind.execute(
+            sa.select(text_passage.c.id, text_passage.c.content)
+            .where(text_passage.c.id > last_id, text_passage.c.text_id.in_(chunked_ids))
+            .order_by(text_passage.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        embeddings = embed_texts([row.content for row in rows])
+        bind.execute(
+            text_passage.update().where(text_passage.c.id == sa.bindparam('passage_id')).values(embedding=sa.bindparam('vector')),
+            [{"passage_id": row.id, "vector": embeddings[index].tobytes()} for index, row in enumerate(rows)],
+        )
+
+    # Workers still running the old code drop their cached bot contexts
+    bind.execute(knowledge_version.update().values(version=knowledge_version.c.version + 1))
+
+
+def downgrade():
+    # Index rows are derived data; nothing to undo
+    pass
@@ -0,0 +1,82 @@
+"""passage term stats
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:20:00.000000
+
+Adds the BM25 term statistics stored with each passage (term hashes and
+frequencies) and fills them in for existing passages, so a tenant's BM25
+index is loaded without tokenizing its passages. The tokenizer and term
+hash below are copies of knowledge.tokenize/term_hash as of this revision;
+this migration must keep writing the same values if those change later.
+
+"""
+from collections import Counter
+import hashlib
+import re
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+text_passage = sa.table('text_passage', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                        sa.column('term_hashes', sa.LargeBinary), sa.column('term_freqs', sa.LargeBinary))
+
+
+def tokenize(text):
+    folded = text.replace('I', 'ı').replace('İ', 'i').lower().replace('i̇', 'i').replace('ı', 'i')
+    return TOKEN_RE.findall(folded)
+
+
+def term_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def term_stats(text):
+    counts = Counter(tokenize(text))
+    hashes = np.array([term_hash(token) for token in counts], dtype='<u8')
+    freqs = np.array(list(counts.values()), dtype='<u2')
+    return hashes.tobytes(), freqs.tobytes()
+
+
+def upgrade():
+    with op.batch_alter_table('text_passage', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('term_hashes', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('term_freqs', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(text_passage.c.id, text_passage.c.content)
+            .where(text_passage.c.id > last_id, text_passage.c.term_hashes.is_(None))
+            .order_by(text_passage.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            term_hashes, term_freqs = term_stats(row.content)
+            updates.append({"passage_id": row.id, "hashes": term_hashes, "freqs": term_freqs})
+        bind.execute(
+            text_passage.update().where(text_passage.c.id == sa.bindparam('passage_id'))
+            .values(term_hashes=sa.bindparam('hashes'), term_freqs=sa.bindparam('freqs')),
+            updates,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('text_passage', schema=None) as batch_op:
+        batch_op.drop_column('term_freqs')
+        batch_op.drop_column('term_hashes')
@@ -0,0 +1,29 @@
+"""knowledge text version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 21:05:00.000000
+
+Counts saved-text changes separately from bot settings changes, so editing
+the purpose, info or intents no longer rebuilds a tenant's passage indexes.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('knowledge_version', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('knowledge_version', schema=None) as batch_op:
+        batch_op.drop_column('text_version')
@@ -1,28 +1,124 @@
+import hashlib
 import json
 import os
+import queue
+import re
+import threading
+import time
+
+from cache import LRUCache, SQLiteCache, SingleFlight
+from upstream import UpstreamLimiter, UpstreamBusy
+from matcher import IntentRouter, fold_for_matching
+from knowledge import estimate_tokens
+from telemetry import metrics
 
 # the newest OpenAI model is "gpt-5" which was released August 7, 2025.
 # do not change this unless explicitly requested by the user
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-# Only initialize OpenAI if API key is available
-openai = None
-if OPENAI_API_KEY:
+# Upstream limits: per-call deadline (slot wait, retries and the whole stream included),
+# bounded connection pool and in-flight caps
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 20))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 1))
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", 0.5))
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", 20))
+
+_upstream = UpstreamLimiter(
+    max_in_flight=int(os.environ.get("LLM_MAX_IN_FLIGHT", 16)),
+    max_per_tenant=int(os.environ.get("LLM_MAX_IN_FLIGHT_PER_TENANT", 4)),
+    max_queue=int(os.environ.get("LLM_MAX_QUEUE", 32)),
+    queue_timeout=float(os.environ.get("LLM_QUEUE_TIMEOUT", 2)),
+    # The public demo chat runs as tenant None and serves every visitor, so it gets its own cap
+    tenant_limits={None: int(os.environ.get("LLM_MAX_IN_FLIGHT_DEMO", 8))},
+)
+
+# The OpenAI SDK takes ~0.6s to import, so the client is created on the first chat call
+# instead of at import time (keeps cold starts of non-chat routes fast)
+_client = None
+_client_unavailable = False
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the OpenAI client, or None if no API key is set or the SDK is missing"""
+    global _client, _client_unavailable
+    if _client is not None or _client_unavailable or not OPENAI_API_KEY:
+        return _client
+    with _client_lock:
+        if _client is None and not _client_unavailable:
+            try:
+                import httpx
+                from openai import OpenAI
+            except ImportError:
+                _client_unavailable = True
+                return None
+            _client = OpenAI(
+                api_key=OPENAI_API_KEY,
+                timeout=LLM_TIMEOUT,
+                # Retries happen in _create, inside the caller's deadline
+                max_retries=0,
+                http_client=httpx.Client(
+                    limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+                    timeout=LLM_TIMEOUT,
+                ),
+            )
+    return _client
+
+# Upstream call metrics (exposed on /metrics)
+_llm_latency = metrics.histogram('llm_request_seconds', 'Upstream LLM call duration until the full reply',
+                                 labels=('mode', 'outcome'))
+_llm_first_token = metrics.histogram('llm_first_token_seconds', 'Upstream LLM time to the first streamed token')
+_llm_errors = metrics.counter('llm_errors_total', 'Failed upstream LLM calls by exception class', labels=('error',))
+_fallbacks = metrics.counter('chat_fallbacks_total', 'Canned fallback replies by reason', labels=('reason',))
+
+def _record_failure(error, mode, call_started, fallback=True):
+    """Count a failed upstream call; shed calls never reached the API"""
+    if isinstance(error, UpstreamBusy):
+        _fallbacks.inc(reason='busy')
+        return
+    if call_started is not None:
+        _llm_latency.observe(time.monotonic() - call_started, mode=mode, outcome='error')
+    _llm_errors.inc(error=type(error).__name__)
+    if fallback:
+        _fallbacks.inc(reason='error')
+
+def upstream_stats():
+    """Return in-flight, queued and shed upstream call counts for this worker"""
+    return _upstream.stats()
+
+class DeadlineExceeded(Exception):
+    """The LLM_TIMEOUT deadline of a call ran out"""
+
+def _remaining_timeout(started):
+    """Time left of the LLM_TIMEOUT deadline; raises DeadlineExceeded once it is spent"""
+    remaining = LLM_TIMEOUT - (time.monotonic() - started)
+    if remaining <= 0:
+        raise DeadlineExceeded(f"LLM deadline of {LLM_TIMEOUT:g}s exceeded")
+    return remaining
+
+def _is_retryable(error):
+    """Connection errors, timeouts, rate limits and 5xx replies are worth another attempt"""
     try:
-        from openai import OpenAI
-        openai = OpenAI(api_key=OPENAI_API_KEY)
+        from openai import APIConnectionError, InternalServerError, RateLimitError
     except ImportError:
-        pass
+        return False
+    return isinstance(error, (APIConnectionError, InternalServerError, RateLimitError))
 
-def chat_with_sahilkamp_bot(user_message):
-    """SahilKamp AI chatbot with smart responses"""
-    
-    # If no OpenAI available, return smart fallback response
-    if not openai or not OPENAI_API_KEY:
-        return get_fallback_response(user_message)
-    
-    try:
-        system_prompt = """Sen SahilKamp İstanbul'un AI asistanısın. Çok akıllı, yardımsever ve dostane bir asistansın.
+def _create(started, **params):
+    """Call chat.completions.create, retrying up to LLM_MAX_RETRIES times within the deadline"""
+    attempt = 0
+    while True:
+        try:
+            return get_client().chat.completions.create(timeout=_remaining_timeout(started), **params)
+        except Exception as e:
+            backoff = LLM_RETRY_BACKOFF * 2 ** attempt
+            remaining = LLM_TIMEOUT - (time.monotonic() - started)
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e) or backoff >= remaining:
+                raise
+            _llm_errors.inc(error=type(e).__name__)
+            attempt += 1
+            time.sleep(backoff)
+
+SAHILKAMP_SYSTEM_PROMPT = """Sen SahilKamp İstanbul'un AI asistanısın. Çok akıllı, yardımsever ve dostane bir asistansın.
         
         SahilKamp Bilgileri:
         - Hafta sonu çadır kamp: 750 TL kişi başı (aktiviteler dahil)
@@ -38,46 +134,357 @@ def chat_with_sahilkamp_bot(user_message):
         
         Kısa, dostane ve bilgilendirici cevaplar ver. Emoji kullan."""
 
-        response = openai.chat.completions.create(
-            model="gpt-5",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
+# Completion parameters (part of the response cache key)
+CHAT_MODEL = "gpt-5"
+CHAT_MAX_TOKENS = 200
+CHAT_TEMPERATURE = 0.7
+
+# Response cache: in-memory LRU per worker, plus an optional SQLite file shared by workers
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 3600))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB")
+
+_response_cache = LRUCache(max_items=10000, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES,
+                           sizeof=lambda value: len(value.encode('utf-8')))
+_shared_cache = SQLiteCache(LLM_CACHE_DB, ttl=LLM_CACHE_TTL) if LLM_CACHE_DB else None
+_cache_stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0}
+
+# Identical concurrent requests share one upstream call (threads here, workers via LLM_CACHE_DB)
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", 30))
+_in_flight = SingleFlight()
+_cache_stats_lock = threading.Lock()
+
+def _count(stat):
+    with _cache_stats_lock:
+        _cache_stats[stat] += 1
+
+def cache_stats():
+    """Return response cache hit/miss counters for this worker"""
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    stats["coalesced"] += _in_flight.coalesced
+    stats["entries"] = len(_response_cache)
+    stats["bytes"] = _response_cache.bytes
+    return stats
+
+def normalize_message(user_message):
+    """Case-fold (Turkish aware) and strip punctuation/extra spaces for cache lookups"""
+    message = fold_for_matching(user_message)
+    return ' '.join(re.findall(r"\w+", message))
+
+def response_cache_key(user_message, system_prompt):
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+    raw_key = json.dumps([normalize_message(user_message), prompt_hash, CHAT_MODEL, CHAT_MAX_TOKENS, CHAT_TEMPERATURE])
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+def get_cached_response(cache_key):
+    reply = _response_cache.get(cache_key)
+    if reply is not None:
+        _count("hits")
+        return reply
+    if _shared_cache:
+        try:
+            reply = _shared_cache.get(cache_key)
+        except Exception:
+            reply = None
+        if reply is not None:
+            _response_cache.set(cache_key, reply)
+            _count("shared_hits")
+            return reply
+    _count("misses")
+    return None
+
+def store_cached_response(cache_key, reply):
+    _response_cache.set(cache_key, reply)
+    if _shared_cache:
+        try:
+            _shared_cache.set(cache_key, reply)
+        except Exception:
+            pass
+
+def _note(meta, **values):
+    """Report cache/fallback/token details back to a caller that asked for them"""
+    if meta is not None:
+        meta.update(values)
+
+def chat_with_sahilkamp_bot(user_message, system_prompt=None, tenant=None, meta=None, fallback_router=None):
+    """SahilKamp AI chatbot with smart responses.
+
+    When ``meta`` is a dict it is filled with ``cache_hit``, ``fallback`` and
+    ``tokens`` for the turn. ``fallback_router`` picks the canned reply used
+    when the model is unavailable (built-in SahilKamp intents by default).
+    """
+    _note(meta, cache_hit=False, fallback=False, tokens=0)
+    
+    # If no OpenAI available, return smart fallback response
+    if not get_client():
+        _fallbacks.inc(reason='unconfigured')
+        _note(meta, fallback=True)
+        return get_fallback_response(user_message, fallback_router)
+    
+    system_prompt = system_prompt or SAHILKAMP_SYSTEM_PROMPT
+    cache_key = response_cache_key(user_message, system_prompt)
+    cached_reply = get_cached_response(cache_key)
+    if cached_reply is not None:
+        _note(meta, cache_hit=True)
+        return cached_reply
+    
+    def complete():
+        outcome = {}
+        reply = _complete_coalesced(cache_key, outcome, lambda: _complete(
+            cache_key, user_message, system_prompt, tenant, outcome, fallback_router))
+        return reply, outcome
+    
+    (reply, outcome), shared = _in_flight.do(cache_key, complete)
+    _note(meta, **(_follower_outcome(outcome) if shared else outcome))
+    return reply
+
+def _follower_outcome(outcome):
+    """Meta of a caller that got the reply of a concurrent identical call; its tokens are metered for that turn"""
+    return dict(outcome, tokens=0, cache_hit=not outcome.get('fallback'))
+
+def _complete_coalesced(cache_key, meta, run):
+    """Get the reply from ``run()``, or wait for another worker already running the same call"""
+    if not _shared_cache:
+        return run()
+    try:
+        leader = _shared_cache.try_lock(cache_key, SINGLE_FLIGHT_TIMEOUT)
+    except Exception:
+        leader = True
+    if not leader:
+        reply = _shared_cache.wait_for(cache_key, SINGLE_FLIGHT_TIMEOUT)
+        if reply is not None:
+            _count("coalesced")
+            _response_cache.set(cache_key, reply)
+            _note(meta, cache_hit=True)
+            return reply
+        return run()
+    try:
+        return run()
+    finally:
+        try:
+            _shared_cache.unlock(cache_key)
+        except Exception:
+            pass
+
+def _complete(cache_key, user_message, system_prompt, tenant, meta=None, fallback_router=None):
+    started = time.monotonic()
+    call_started = None
+    try:
+        with _upstream.slot(tenant):
+            call_started = time.monotonic()
+            response = _create(
+                started,
+                model=CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                max_tokens=CHAT_MAX_TOKENS,
+                temperature=CHAT_TEMPERATURE,
+            )
+        _llm_latency.observe(time.monotonic() - call_started, mode='complete', outcome='ok')
         
-        return response.choices[0].message.content
+        reply = response.choices[0].message.content
+        if response.usage:
+            _note(meta, tokens=response.usage.total_tokens)
+        if reply:
+            store_cached_response(cache_key, reply)
+        return reply
         
     except Exception as e:
-        return get_fallback_response(user_message)
+        _record_failure(e, 'complete', call_started)
+        _note(meta, fallback=True)
+        return get_fallback_response(user_message, fallback_router)
 
-def get_fallback_response(user_message):
-    """Smart fallback responses when OpenAI is not available"""
-    message = user_message.lower()
-    
-    # SahilKamp specific responses
-    if any(keyword in message for keyword in ['fiyat', 'ücret', 'para', 'kaç tl', 'ne kadar']):
-        return "🏕️ SahilKamp fiyatlarımız:\n• Hafta sonu: 750 TL/kişi\n• Hafta içi: 550 TL/kişi\n• Çadır kiralama: 150 TL/gece\nKahvaltı, akşam yemeği ve aktiviteler dahil! ✨"
-    
-    elif any(keyword in message for keyword in ['aktivite', 'etkinlik', 'yapabilir', 'neler var']):
-        return "🚣‍♀️ SahilKamp aktivitelerimiz:\n• Kano turları\n• Doğa yürüyüşleri\n• Ateş başı etkinlikleri\n• Trekking rotaları\nHepsine katılım ücretsiz! 🏃‍♂️"
+_STREAM_END = object()
+
+def stream_sahilkamp_bot(user_message, system_prompt=None, tenant=None, meta=None, fallback_router=None):
+    """Yield the reply in chunks as the model produces them.
+
+    Cache hits and fallback responses are yielded as a single chunk. Cache
+    misses are coalesced like in chat_with_sahilkamp_bot: the first caller
+    streams the upstream reply, identical calls arriving meanwhile (in this
+    worker, or in others through LLM_CACHE_DB) get the finished reply as one
+    chunk. The upstream call runs on its own thread, so its slot is released
+    when the model is done, not when a slow client has read every chunk.
+    ``meta`` is filled like in chat_with_sahilkamp_bot by the time the stream ends.
+    """
+    _note(meta, cache_hit=False, fallback=False, tokens=0)
+    if not get_client():
+        _fallbacks.inc(reason='unconfigured')
+        _note(meta, fallback=True)
+        yield get_fallback_response(user_message, fallback_router)
+        return
     
-    elif any(keyword in message for keyword in ['rezervasyon', 'ayırt', 'yer', 'rezerve']):
-        return "📅 Rezervasyon için:\n• %30 ön ödeme yeterli\n• Check-in: 15:00\n• Check-out: 12:00\n• Kalan ödeme check-in sırasında\nHemen yer ayırtalım! 🎪"
+    system_prompt = system_prompt or SAHILKAMP_SYSTEM_PROMPT
+    cache_key = response_cache_key(user_message, system_prompt)
+    cached_reply = get_cached_response(cache_key)
+    if cached_reply is not None:
+        _note(meta, cache_hit=True)
+        yield cached_reply
+        return
     
-    elif any(keyword in message for keyword in ['pet', 'hayvan', 'köpek', 'kedi', 'evcil']):
-        return "🐕 Pet-friendly alanlarımız var!\n• 50 TL ek ücret\n• Özel pet alanları\n• Su ve mama kabı sağlanır\nTüylü dostlarınızla gelin! 🐾"
+    chunks = queue.Queue()
+    outcome = {}
     
-    elif any(keyword in message for keyword in ['ulaşım', 'nasıl gelir', 'yol', 'otobüs']):
-        return "🚌 Ulaşım seçenekleri:\n• İstanbul'dan düzenli otobüs seferleri\n• Pazartesi-Cumartesi günleri\n• Kendi aracınızla da gelebilirsiniz\nDetaylı yol tarifi gönderebilirim! 🗺️"
+    def produce():
+        sent = []
+        
+        def send(delta):
+            sent.append(delta)
+            chunks.put(delta)
         
-    elif any(keyword in message for keyword in ['çadır', 'kamp', 'equipment']):
-        return "⛺ Çadır ve ekipman:\n• Kendi çadırınızı getirebilirsiniz\n• Bizden de kiralayabilirsiniz (150 TL/gece)\n• Uyku tulumu ve matras dahil\nTercihinizi belirtin! 🎒"
+        def complete():
+            leader_outcome = {}
+            reply = _complete_coalesced(cache_key, leader_outcome, lambda: _stream_complete(
+                cache_key, user_message, system_prompt, tenant, leader_outcome, fallback_router, send))
+            return reply, leader_outcome
+        
+        try:
+            (reply, result), shared = _in_flight.do(cache_key, complete)
+            outcome.update(_follower_outcome(result) if shared else result)
+            if reply and not sent:
+                chunks.put(reply)
+        except Exception as e:
+            _record_failure(e, 'stream', None, fallback=not sent)
+            if not sent:
+                outcome['fallback'] = True
+                chunks.put(get_fallback_response(user_message, fallback_router))
+        finally:
+            chunks.put(_STREAM_END)
+    
+    threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+    parts = []
+    finished = False
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _STREAM_END:
+                finished = True
+                break
+            parts.append(chunk)
+            yield chunk
+    finally:
+        if finished:
+            _note(meta, **outcome)
+        elif parts:
+            # Client gone mid-stream: the call completes in the background (and fills the cache),
+            # this turn is metered for what it was sent
+            _note(meta, tokens=estimate_tokens(system_prompt) + estimate_tokens(user_message) + estimate_tokens(''.join(parts)))
+
+def _stream_complete(cache_key, user_message, system_prompt, tenant, meta, fallback_router, send):
+    """Stream one upstream reply, passing each delta to ``send``; returns the full reply.
+
+    Fallback replies are returned without being sent. A reply cut short by
+    an upstream error or by the LLM_TIMEOUT deadline is returned as far as
+    it got and not cached.
+    """
+    started = time.monotonic()
+    try:
+        _upstream.acquire(tenant)
+    except UpstreamBusy as e:
+        _record_failure(e, 'stream', None)
+        _note(meta, fallback=True)
+        return get_fallback_response(user_message, fallback_router)
     
-    elif 'merhaba' in message or 'selam' in message or 'hello' in message:
-        return "Merhaba! 👋 SahilKamp İstanbul'a hoşgeldiniz! \nSize nasıl yardımcı olabilirim? Fiyatlar, aktiviteler, rezervasyon... Her konuda yanınızdayım! 🏕️✨"
+    parts = []
+    stream = None
+    usage_reported = False
+    call_started = time.monotonic()
+    try:
+        stream = _create(
+            started,
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            max_tokens=CHAT_MAX_TOKENS,
+            temperature=CHAT_TEMPERATURE,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            _remaining_timeout(started)
+            if chunk.usage:
+                usage_reported = True
+                _note(meta, tokens=chunk.usage.total_tokens)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not parts:
+                    _llm_first_token.observe(time.monotonic() - call_started)
+                parts.append(delta)
+                send(delta)
+        _llm_latency.observe(time.monotonic() - call_started, mode='stream', outcome='ok')
+    except Exception as e:
+        _record_failure(e, 'stream', call_started, fallback=not parts)
+        if not parts:
+            _note(meta, fallback=True)
+            return get_fallback_response(user_message, fallback_router)
+        return ''.join(parts)
+    finally:
+        if stream is not None:
+            stream.close()
+        _upstream.release(tenant)
+        if parts and not usage_reported:
+            # Cut short before the usage chunk: meter an estimate
+            _note(meta, tokens=estimate_tokens(system_prompt) + estimate_tokens(user_message) + estimate_tokens(''.join(parts)))
     
-    else:
-        return "🤖 Size yardımcı olmaya çalışıyorum! SahilKamp hakkında:\n• Fiyatlar ve paketler\n• Aktiviteler ve etkinlikler\n• Rezervasyon bilgileri\n• Pet policy\nHangi konuda bilgi almak istersiniz? 🌟"
\ No newline at end of file
+    reply = ''.join(parts)
+    if reply:
+        store_cached_response(cache_key, reply)
+    return reply
+
+# Fallback intents in priority order (the first matching intent wins)
+FALLBACK_INTENTS = [
+    {
+        "name": "pricing",
+        "keywords": ['fiyat', 'ücret', 'para', 'kaç tl', 'ne kadar'],
+        "reply": "🏕️ SahilKamp fiyatlarımız:\n• Hafta sonu: 750 TL/kişi\n• Hafta içi: 550 TL/kişi\n• Çadır kiralama: 150 TL/gece\nKahvaltı, akşam yemeği ve aktiviteler dahil! ✨",
+    },
+    {
+        "name": "activities",
+        "keywords": ['aktivite', 'etkinlik', 'yapabilir', 'neler var'],
+        "reply": "🚣‍♀️ SahilKamp aktivitelerimiz:\n• Kano turları\n• Doğa yürüyüşleri\n• Ateş başı etkinlikleri\n• Trekking rotaları\nHepsine katılım ücretsiz! 🏃‍♂️",
+    },
+    {
+        "name": "reservation",
+        "keywords": ['rezervasyon', 'ayırt', 'yer', 'rezerve'],
+        "reply": "📅 Rezervasyon için:\n• %30 ön ödeme yeterli\n• Check-in: 15:00\n• Check-out: 12:00\n• Kalan ödeme check-in sırasında\nHemen yer ayırtalım! 🎪",
+    },
+    {
+        "name": "pets",
+        "keywords": ['pet', 'hayvan', 'köpek', 'kedi', 'evcil'],
+        "reply": "🐕 Pet-friendly alanlarımız var!\n• 50 TL ek ücret\n• Özel pet alanları\n• Su ve mama kabı sağlanır\nTüylü dostlarınızla gelin! 🐾",
+    },
+    {
+        "name": "transport",
+        "keywords": ['ulaşım', 'nasıl gelir', 'yol', 'otobüs'],
+        "reply": "🚌 Ulaşım seçenekleri:\n• İstanbul'dan düzenli otobüs seferleri\n• Pazartesi-Cumartesi günleri\n• Kendi aracınızla da gelebilirsiniz\nDetaylı yol tarifi gönderebilirim! 🗺️",
+    },
+    {
+        "name": "equipment",
+        "keywords": ['çadır', 'kamp', 'equipment'],
+        "reply": "⛺ Çadır ve ekipman:\n• Kendi çadırınızı getirebilirsiniz\n• Bizden de kiralayabilirsiniz (150 TL/gece)\n• Uyku tulumu ve matras dahil\nTercihinizi belirtin! 🎒",
+    },
+    {
+        "name": "greeting",
+        "keywords": ['merhaba', 'selam', 'hello'],
+        "reply": "Merhaba! 👋 SahilKamp İstanbul'a hoşgeldiniz! \nSize nasıl yardımcı olabilirim? Fiyatlar, aktiviteler, rezervasyon... Her konuda yanınızdayım! 🏕️✨",
+    },
+]
+
+FALLBACK_DEFAULT_REPLY = "🤖 Size yardımcı olmaya çalışıyorum! SahilKamp hakkında:\n• Fiyatlar ve paketler\n• Aktiviteler ve etkinlikler\n• Rezervasyon bilgileri\n• Pet policy\nHangi konuda bilgi almak istersiniz? 🌟"
+
+_default_router = IntentRouter(FALLBACK_INTENTS, FALLBACK_DEFAULT_REPLY)
+
+def build_fallback_router(intents=None, default_reply=None):
+    """Compile tenant intents; tenants without their own intents get the built-in ones"""
+    if not intents and not default_reply:
+        return _default_router
+    return IntentRouter(intents or FALLBACK_INTENTS, default_reply or FALLBACK_DEFAULT_REPLY)
+
+def get_fallback_response(user_message, router=None):
+    """Smart fallback responses when OpenAI is not available"""
+    return (router or _default_router).reply(user_message)
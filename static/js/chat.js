@@ -1,3 +1,53 @@
+// Reads a chat reply from /api/chat or /api/bot-chat as Server-Sent Events.
+// onDelta(chunk, replySoFar) is called for every chunk; resolves with the full reply.
+async function streamChat(url, payload, headers, onDelta) {
+    const response = await fetch(url, {
+        method: "POST",
+        headers: Object.assign({ "Content-Type": "application/json", "Accept": "text/event-stream" }, headers || {}),
+        body: JSON.stringify(Object.assign({}, payload, { stream: true }))
+    });
+
+    const contentType = response.headers.get("Content-Type") || "";
+    if (!response.ok || !contentType.includes("text/event-stream")) {
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || "Sistem hatası");
+        const reply = data.reply || data.response || "";
+        onDelta(reply, reply);
+        return reply;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let reply = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = "message";
+            let data = "";
+            for (const line of rawEvent.split("\n")) {
+                if (line.startsWith("event:")) eventName = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            if (!data) continue;
+
+            const event = JSON.parse(data);
+            if (eventName === "error") throw new Error(event.error);
+            if (eventName === "done") return event.reply;
+            reply += event.delta;
+            onDelta(event.delta, reply);
+        }
+    }
+    return reply;
+}
+
 async function sendMessage() {
     const input = document.getElementById("userInput");
     const message = input.value.trim();
@@ -8,16 +58,18 @@ async function sendMessage() {
 
     input.value = "";
 
-    const response = await fetch("/api/chat", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message })
-    });
+    const botDiv = document.createElement("div");
+    botDiv.className = "p-2 bg-red-100 rounded my-1";
+    botDiv.innerHTML = "<b>Bot:</b> <span></span>";
+    chatBox.appendChild(botDiv);
+    const replySpan = botDiv.querySelector("span");
 
-    const data = await response.json();
-    if (data.reply) {
-        chatBox.innerHTML += `<div class="p-2 bg-red-100 rounded my-1"><b>Bot:</b> ${data.reply}</div>`;
-    } else {
-        chatBox.innerHTML += `<div class="p-2 bg-red-200 rounded my-1">⚠️ Hata: ${data.error}</div>`;
+    try {
+        await streamChat("/api/chat", { message }, {}, (chunk, reply) => {
+            replySpan.textContent = reply;
+        });
+    } catch (error) {
+        botDiv.className = "p-2 bg-red-200 rounded my-1";
+        botDiv.textContent = `⚠️ Hata: ${error.message}`;
     }
 }
@@ -0,0 +1,223 @@
+"""In-process metrics in the Prometheus text format, plus an on-demand sampling profiler."""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StackCounter
+
+# Request/upstream durations in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Per-request counts (e.g. DB queries)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.label_names), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _labels(self.label_names, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., overflow count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                yield self.name + '_bucket', _labels(self.label_names, key, [('le', _number(bound))]), cumulative
+            yield self.name + '_sum', _labels(self.label_names, key), round(values[-1], 6)
+            yield self.name + '_count', _labels(self.label_names, key), cumulative
+
+
+class Gauge:
+    """Value read from a callback at scrape time; the callback returns a number or {label value: number}.
+
+    ``kind='counter'`` exposes a callback that reads a monotonic count kept elsewhere.
+    """
+
+    def __init__(self, name, help, read, label=None, kind='gauge'):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label = label
+        self.kind = kind
+
+    def samples(self):
+        value = self.read()
+        if self.label is None:
+            yield self.name, '', value
+            return
+        for label_value, number in sorted(value.items()):
+            yield self.name, _labels((self.label,), (label_value,)), number
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, read, label=None, kind='gauge'):
+        return self._register(Gauge(name, help, read, label, kind))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue  # a failing gauge callback must not break the scrape
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every module of this worker
+metrics = Registry()
+
+_started = time.time()
+
+
+def _resident_memory_bytes():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+metrics.gauge('process_start_time_seconds', 'Start time of the process since the Unix epoch', lambda: round(_started, 3))
+metrics.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', _resident_memory_bytes)
+metrics.gauge('process_threads', 'Number of Python threads', threading.active_count)
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of every thread's Python stack.
+
+    ``profile`` samples ``sys._current_frames()`` at ``hz`` for a number of
+    seconds and returns collapsed stacks ("thread;outer;...;inner count"),
+    the input format of flamegraph.pl and speedscope. One profile runs at a
+    time per process; the overhead only exists while it runs.
+    """
+
+    def __init__(self, hz=100, max_seconds=60):
+        self.hz = hz
+        self.max_seconds = max_seconds
+        self._running = threading.Lock()
+
+    def profile(self, seconds):
+        """Return collapsed stack counts, or None if another profile is running"""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(min(seconds, self.max_seconds))
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds):
+        stacks = StackCounter()
+        me = threading.get_ident()
+        interval = 1 / self.hz
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(ident, 'thread'))
+                stacks[';'.join(reversed(frames))] += 1
+            time.sleep(interval)
+        return stacks
+
+    @staticmethod
+    def collapse(stacks):
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
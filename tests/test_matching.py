@@ -0,0 +1,61 @@
+"""Case folding for intent routing, tenant keywords and the response cache key.
+
+Input typed without Turkish letters spells ı as i (and İ as I); it has to
+match the same intents and keywords as correctly spelled input.
+"""
+
+import pytest
+
+from knowledge import parse_keywords, match_keywords, tokenize
+from matcher import KeywordMatcher, fold_case
+from openai_service import FALLBACK_DEFAULT_REPLY, FALLBACK_INTENTS, get_fallback_response, normalize_message
+
+INTENT_REPLIES = {intent["name"]: intent["reply"] for intent in FALLBACK_INTENTS}
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("FIYAT?", "pricing"),
+    ("FİYAT?", "pricing"),
+    ("fiyat ne", "pricing"),
+    ("AKTIVITE", "activities"),
+    ("AKTİVİTE", "activities"),
+    ("KEDI var mi", "pets"),
+    ("EVCIL", "pets"),
+    ("evcıl hayvan", "pets"),
+    ("ULASIM", None),
+    ("ULAŞIM", "transport"),
+    ("CADIR", None),
+    ("ÇADIR", "equipment"),
+    ("MERHABA", "greeting"),
+])
+def test_fallback_routes_uppercase_and_ascii_input(message, intent):
+    expected = INTENT_REPLIES[intent] if intent else FALLBACK_DEFAULT_REPLY
+    assert get_fallback_response(message) == expected
+
+
+def test_tenant_keywords_match_both_spellings():
+    keyword_map = {keyword: [1] for keyword in parse_keywords("Kahvaltı, İstanbul, IĞDIR")}
+    for message in ("KAHVALTI dahil mi", "kahvalti var mi", "Kahvaltı?", "ISTANBUL", "istanbul", "ığdır", "IĞDİR", "iğdir"):
+        assert match_keywords(message, keyword_map) == [1], message
+
+
+def test_parse_keywords_keeps_turkish_spelling_and_drops_variants():
+    assert parse_keywords("Kahvaltı, KAHVALTI, kahvalti, İstanbul") == ["kahvaltı", "istanbul"]
+
+
+def test_keyword_matcher_reports_keywords_as_given():
+    matcher = KeywordMatcher(["kahvaltı", "fiyat"])
+    assert matcher.find("FIYAT VE KAHVALTI") == {"kahvaltı", "fiyat"}
+
+
+def test_fold_case_is_turkish_lowercase():
+    assert fold_case("IĞDIR İSTANBUL") == "ığdır istanbul"
+
+
+@pytest.mark.parametrize("variants", [
+    ("Fiyatlarınız ne kadar?", "FIYATLARINIZ NE KADAR", "fiyatlariniz ne kadar"),
+    ("Köpeğimi getirebilir miyim?", "KÖPEĞİMİ GETİREBİLİR MİYİM", "KÖPEĞIMI GETIREBILIR MIYIM?"),
+])
+def test_cache_key_and_tokens_ignore_case_and_dotted_i(variants):
+    assert len({normalize_message(message) for message in variants}) == 1
+    assert len({tuple(tokenize(message)) for message in variants}) == 1
@@ -0,0 +1,176 @@
+"""Coalescing and deadlines of chat replies.
+
+Identical questions streamed at the same time share one upstream call:
+the first caller streams it, the others get the finished reply as one chunk.
+Every call, retries and the whole stream included, ends within LLM_TIMEOUT.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import openai_service
+from cache import SQLiteCache
+
+REPLY_PARTS = ["Merhaba! ", "Hafta sonu ", "750 TL."]
+REPLY = "".join(REPLY_PARTS)
+
+
+class FakeCompletions:
+    """chat.completions stand-in that counts calls and answers after a delay"""
+
+    def __init__(self, delay=0.3):
+        self.delay = delay
+        self.chunk_delay = 0
+        self.failures = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None
+        time.sleep(self.delay)
+        if failure:
+            raise failure
+        if not stream:
+            message = SimpleNamespace(content=REPLY)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=42))
+        return FakeStream(self.chunk_delay)
+
+
+class FakeStream:
+    def __init__(self, chunk_delay=0):
+        self.chunk_delay = chunk_delay
+
+    def __iter__(self):
+        for part in REPLY_PARTS:
+            time.sleep(self.chunk_delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=42))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(openai_service, "get_client", lambda: client)
+    monkeypatch.setattr(openai_service, "_shared_cache", None)
+    openai_service._response_cache.clear()
+    yield completions
+    openai_service._response_cache.clear()
+
+
+def run_concurrently(calls):
+    results = [None] * len(calls)
+
+    def run(index):
+        results[index] = calls[index]()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def streamed(message, meta):
+    return lambda: list(openai_service.stream_sahilkamp_bot(message, meta=meta))
+
+
+def test_concurrent_identical_streams_make_one_upstream_call(completions):
+    metas = [{} for _ in range(6)]
+    results = run_concurrently([streamed("Fiyatlar nedir?", meta) for meta in metas])
+
+    assert completions.calls == 1
+    assert all("".join(chunks) == REPLY for chunks in results)
+    leaders = [meta for meta in metas if not meta["cache_hit"]]
+    assert len(leaders) == 1 and leaders[0]["tokens"] == 42
+    assert all(meta["tokens"] == 0 and not meta["fallback"] for meta in metas if meta["cache_hit"])
+
+
+def test_streams_and_plain_calls_share_one_upstream_call(completions):
+    metas = [{} for _ in range(4)]
+    calls = [streamed("fiyatlar nedir", metas[0]), streamed("FİYATLAR NEDİR?", metas[1])]
+    calls += [lambda meta=meta: openai_service.chat_with_sahilkamp_bot("Fiyatlar nedir", meta=meta) for meta in metas[2:]]
+    results = run_concurrently(calls)
+
+    assert completions.calls == 1
+    assert ["".join(result) for result in results[:2]] + results[2:] == [REPLY] * 4
+    assert sum(meta["tokens"] for meta in metas) == 42
+
+
+def test_stream_waits_for_another_worker(completions, monkeypatch, tmp_path):
+    shared = SQLiteCache(str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(openai_service, "_shared_cache", shared)
+    cache_key = openai_service.response_cache_key("Fiyatlar nedir?", openai_service.SAHILKAMP_SYSTEM_PROMPT)
+    assert shared.try_lock(cache_key, 30)  # another worker is running this call
+    threading.Timer(0.2, lambda: (shared.set(cache_key, REPLY), shared.unlock(cache_key))).start()
+
+    meta = {}
+    chunks = list(openai_service.stream_sahilkamp_bot("Fiyatlar nedir?", meta=meta))
+
+    assert chunks == [REPLY]
+    assert completions.calls == 0
+    assert meta["cache_hit"] and meta["tokens"] == 0
+
+
+def test_slow_reader_does_not_hold_an_upstream_slot(completions):
+    completions.delay = 0
+    stream = openai_service.stream_sahilkamp_bot("Fiyatlar nedir?")
+    assert next(stream) == REPLY_PARTS[0]
+    deadline = time.monotonic() + 2
+    while openai_service.upstream_stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert openai_service.upstream_stats()["in_flight"] == 0
+    assert "".join(stream) == "".join(REPLY_PARTS[1:])
+
+
+def timeout_error():
+    return openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def test_timed_out_call_is_retried_within_the_deadline(completions, monkeypatch):
+    monkeypatch.setattr(openai_service, "LLM_RETRY_BACKOFF", 0.01)
+    completions.delay = 0
+    completions.failures = [timeout_error()]
+    meta = {}
+
+    assert openai_service.chat_with_sahilkamp_bot("Fiyatlar nedir?", meta=meta) == REPLY
+    assert completions.calls == 2 and not meta["fallback"]
+
+
+def test_call_past_the_deadline_falls_back_without_retrying(completions, monkeypatch):
+    monkeypatch.setattr(openai_service, "LLM_TIMEOUT", 0.2)
+    completions.failures = [timeout_error()]
+    meta = {}
+
+    reply = openai_service.chat_with_sahilkamp_bot("Fiyatlar nedir?", meta=meta)
+
+    assert completions.calls == 1
+    assert meta["fallback"] and reply == openai_service.get_fallback_response("Fiyatlar nedir?")
+    with pytest.raises(openai_service.DeadlineExceeded):
+        openai_service._remaining_timeout(time.monotonic() - 0.3)
+
+
+def test_stream_is_cut_off_at_the_deadline(completions, monkeypatch):
+    monkeypatch.setattr(openai_service, "LLM_TIMEOUT", 0.5)
+    completions.delay = 0
+    completions.chunk_delay = 0.3
+    started = time.monotonic()
+
+    chunks = list(openai_service.stream_sahilkamp_bot("Fiyatlar nedir?"))
+
+    assert time.monotonic() - started < 0.8
+    assert "".join(chunks) == REPLY_PARTS[0]
+    assert openai_service.get_cached_response(
+        openai_service.response_cache_key("Fiyatlar nedir?", openai_service.SAHILKAMP_SYSTEM_PROMPT)) is None
@@ -0,0 +1,95 @@
+"""Concurrency limits and load shedding for upstream LLM calls."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class UpstreamBusy(Exception):
+    """Raised when an upstream call is shed instead of queued"""
+
+
+class UpstreamLimiter:
+    """Global and per-tenant in-flight limits with a bounded wait queue.
+
+    Callers wait up to ``queue_timeout`` seconds for a slot. When more than
+    ``max_queue`` callers are already waiting, or the wait times out, the call
+    is shed with UpstreamBusy so the caller can fail fast to a fallback.
+    Waiters are served in arrival order: a free slot goes to the earliest
+    waiter whose tenant is under its cap, never to a caller arriving later.
+    ``tenant_limits`` overrides ``max_per_tenant`` for specific tenants.
+    """
+
+    def __init__(self, max_in_flight=16, max_per_tenant=4, max_queue=32, queue_timeout=2.0, tenant_limits=None):
+        self.max_in_flight = max_in_flight
+        self.max_per_tenant = max_per_tenant
+        self.tenant_limits = tenant_limits or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+        self._tenants = {}
+        self._waiters = []  # [(waiter, tenant)] in arrival order
+        self._condition = threading.Condition()
+
+    def _has_slot(self, tenant):
+        limit = self.tenant_limits.get(tenant, self.max_per_tenant)
+        return self.in_flight < self.max_in_flight and self._tenants.get(tenant, 0) < limit
+
+    def _can_take(self, tenant, waiter=None):
+        """Whether a slot is free for tenant and no earlier waiter could take it"""
+        if not self._has_slot(tenant):
+            return False
+        for queued, queued_tenant in self._waiters:
+            if queued is waiter:
+                return True
+            if self._has_slot(queued_tenant):
+                return False
+        return True
+
+    def acquire(self, tenant=None):
+        with self._condition:
+            if not self._can_take(tenant):
+                if self.queued >= self.max_queue:
+                    self.shed += 1
+                    raise UpstreamBusy("upstream queue is full")
+                waiter = object()
+                self._waiters.append((waiter, tenant))
+                self.queued += 1
+                try:
+                    deadline = time.monotonic() + self.queue_timeout
+                    while not self._can_take(tenant, waiter):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed += 1
+                            raise UpstreamBusy("timed out waiting for an upstream slot")
+                        self._condition.wait(remaining)
+                finally:
+                    self.queued -= 1
+                    self._waiters.remove((waiter, tenant))
+                    self._condition.notify_all()
+            self.in_flight += 1
+            self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+
+    def release(self, tenant=None):
+        with self._condition:
+            self.in_flight -= 1
+            count = self._tenants.get(tenant, 0) - 1
+            if count > 0:
+                self._tenants[tenant] = count
+            else:
+                self._tenants.pop(tenant, None)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, tenant=None):
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def stats(self):
+        with self._condition:
+            return {"in_flight": self.in_flight, "queued": self.queued, "shed": self.shed}
@@ -0,0 +1,86 @@
+"""Write-behind buffering for records that do not need a synchronous commit."""
+
+import atexit
+import os
+import threading
+from collections import deque
+
+
+class WriteBehindBuffer:
+    """Collect items in memory and hand them to ``flush_fn`` in batches.
+
+    A daemon thread flushes every ``interval`` seconds, or sooner once
+    ``max_batch`` items are waiting. When more than ``max_pending`` items are
+    queued (e.g. the database is down) new items are dropped and counted
+    instead of growing memory without bound.
+    """
+
+    def __init__(self, flush_fn, max_batch=500, interval=1.0, max_pending=10000):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def enqueue(self, item):
+        with self._condition:
+            if len(self._items) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            if len(self._items) >= self.max_batch:
+                self._condition.notify()
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so gunicorn workers start their own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def _take_batch(self):
+        with self._condition:
+            count = min(len(self._items), self.max_batch)
+            return [self._items.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if len(self._items) < self.max_batch:
+                    self._condition.wait(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Write out everything queued so far (also runs at interpreter exit)"""
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                try:
+                    self.flush_fn(batch)
+                    self.flushed += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    print(f"WARNING: write-behind flush of {len(batch)} items failed: {e}")
+
+    def stats(self):
+        return {
+            "pending": len(self._items),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
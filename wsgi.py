@@ -0,0 +1,45 @@
+"""Serverless entry point (vercel.json routes every request here).
+
+Requests for the public pages (index, pricing, health) and static files are
+answered by a bare ``create_app()`` without importing main.py. The first
+request for anything else imports main.py under a lock, and from then on
+every request goes to the full app so hooks, metrics and limits apply
+uniformly.
+"""
+
+import threading
+
+from werkzeug.exceptions import HTTPException
+
+from factory import create_app
+
+light = create_app(full=False)
+
+_full_app = None
+_full_app_lock = threading.Lock()
+
+
+def get_full_app():
+    """Import main.py once and return its app"""
+    global _full_app
+    if _full_app is None:
+        with _full_app_lock:
+            if _full_app is None:
+                import main
+                _full_app = main.app
+    return _full_app
+
+
+def served_by_light(environ):
+    """True if the light app has a view for this path and method"""
+    try:
+        endpoint, _ = light.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return False  # 404/405/redirects are answered by the full app
+    return endpoint in light.view_functions
+
+
+def app(environ, start_response):
+    if _full_app is None and served_by_light(environ):
+        return light(environ, start_response)
+    return get_full_app()(environ, start_response)